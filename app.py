@@ -1,12 +1,156 @@
 import streamlit as st
 import json
+import re
 import pandas as pd
+import numpy as np
+from pandas.api.types import union_categoricals
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from tenacity import retry, stop_after_attempt, wait_exponential
 import time
+import os
+import gzip
+import shutil
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import ijson
+except ImportError:  # fall back to json.load when ijson is not installed
+    ijson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+    import pyarrow.dataset
+    import pyarrow.compute
+except ImportError:  # snapshots are skipped when pyarrow is not installed
+    pa = None
+
+try:
+    import duckdb
+except ImportError:  # the DuckDB analytics backend needs duckdb (and pyarrow)
+    duckdb = None
+
+try:
+    import polars as pl
+except ImportError:  # the Polars backend needs polars (and pyarrow)
+    pl = None
+
+# Display format for 'Asked at'; the column itself stays datetime64[ns, UTC]
+DISPLAY_DATE_FORMAT = "%B %d, %Y %H:%M:%S"
+
+# Number of rows accumulated before a batch is emitted during ingestion
+INGEST_BATCH_SIZE = int(os.environ.get("CBA_INGEST_BATCH_SIZE", "50000"))
+
+# Conversation fields checked, in order, for a visitor/session id; the conversation id is the fallback
+VISITOR_ID_FIELDS = ('visitor_id', 'session_id', 'customer', 'user_id')
+
+# Bounds for the in-memory cache of processed exports (shared by all sessions)
+PARSE_CACHE_MAX_ENTRIES = int(os.environ.get("CBA_PARSE_CACHE_MAX_ENTRIES", "4"))
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("CBA_PARSE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Bounds for the cached row orders of the Full Data View (one per sort, filter and data version)
+ROW_ORDER_CACHE_MAX_ENTRIES = int(os.environ.get("CBA_ROW_ORDER_CACHE_MAX_ENTRIES", "16"))
+ROW_ORDER_CACHE_MAX_BYTES = int(os.environ.get("CBA_ROW_ORDER_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+
+# Questions classified per chunk (one progress update per chunk)
+CATEGORY_CHUNK_SIZE = int(os.environ.get("CBA_CATEGORY_CHUNK_SIZE", "100000"))
+
+# Worker processes used by the parallel category analysis mode
+CATEGORY_WORKERS = int(os.environ.get("CBA_CATEGORY_WORKERS", str(os.cpu_count() or 1)))
+
+# Distinct question texts remembered across sessions by the category memo
+CATEGORY_MEMO_MAX_ENTRIES = int(os.environ.get("CBA_CATEGORY_MEMO_MAX_ENTRIES", "1000000"))
+
+# HyperLogLog precision for approximate distinct counts (2**p registers, ~1.04/sqrt(2**p) error)
+HLL_PRECISION = int(os.environ.get("CBA_HLL_PRECISION", "11"))
+
+# Rule-set file for question categories; recompiled only when its mtime changes
+CATEGORY_RULES_PATH = os.environ.get(
+    "CBA_CATEGORY_RULES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_rules.json")
+)
+
+# Local directory for Arrow snapshots of processed exports, keyed by content hash
+SNAPSHOT_DIR = os.environ.get(
+    "CBA_SNAPSHOT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "chatbase-analytics", "snapshots")
+)
+# Bounds for the snapshots kept in SNAPSHOT_DIR; least recently loaded go first
+SNAPSHOT_MAX_FILES = int(os.environ.get("CBA_SNAPSHOT_MAX_FILES", "16"))
+SNAPSHOT_MAX_BYTES = int(os.environ.get("CBA_SNAPSHOT_MAX_BYTES", str(8 * 1024 ** 3)))
+# Local store used by incremental ingestion of overlapping exports
+STORE_DIR = os.environ.get(
+    "CBA_STORE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "chatbase-analytics", "store")
+)
+
+# Download files are generated here on first click and reused per data version
+EXPORT_DIR = os.environ.get(
+    "CBA_EXPORT_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "chatbase-analytics", "exports")
+)
+# Bounds for the download files kept in EXPORT_DIR; least recently downloaded go first
+EXPORT_MAX_FILES = int(os.environ.get("CBA_EXPORT_MAX_FILES", "32"))
+EXPORT_MAX_BYTES = int(os.environ.get("CBA_EXPORT_MAX_BYTES", str(2 * 1024 ** 3)))
+# Rows serialized per chunk when writing a download file
+EXPORT_CHUNK_ROWS = int(os.environ.get("CBA_EXPORT_CHUNK_ROWS", "100000"))
+
+# Download formats: file extension and MIME type
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip)': ('.csv.gz', 'application/gzip'),
+    'Parquet (zstd)': ('.parquet', 'application/vnd.apache.parquet'),
+    'Arrow IPC': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Out-of-core mode: processed rows are spilled here as Parquet, one directory per content hash
+SPILL_DIR = os.environ.get(
+    "CBA_SPILL_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "chatbase-analytics", "spill")
+)
+# Bump whenever the spill directory layout changes
+SPILL_LAYOUT_VERSION = 3
+# Bounds for the spilled exports kept in SPILL_DIR; least recently loaded go first
+SPILL_MAX_ENTRIES = int(os.environ.get("CBA_SPILL_MAX_ENTRIES", "8"))
+SPILL_MAX_BYTES = int(os.environ.get("CBA_SPILL_MAX_BYTES", str(32 * 1024 ** 3)))
+
+# Peak memory budget of out-of-core mode, and the working set per row (message lists,
+# typed columns, partial aggregates) used to turn it into a batch size
+MEMORY_BUDGET_MB = int(os.environ.get("CBA_MEMORY_BUDGET_MB", "256"))
+ROW_WORKING_BYTES = int(os.environ.get("CBA_ROW_WORKING_BYTES", "1024"))
+
+# Question Details rows shown in out-of-core mode (downloads are complete)
+QUESTION_PREVIEW_ROWS = int(os.environ.get("CBA_QUESTION_PREVIEW_ROWS", "1000"))
+
+# Spill directory and memory cap of the embedded DuckDB engine; aggregations larger than
+# the cap are spilled to disk instead of failing
+DUCKDB_TEMP_DIR = os.environ.get(
+    "CBA_DUCKDB_TEMP_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "chatbase-analytics", "duckdb")
+)
+DUCKDB_MEMORY_LIMIT = os.environ.get("CBA_DUCKDB_MEMORY_LIMIT", "2GB")
+
+# Registers used by DuckDB's approx_count_distinct (fixed by the engine)
+DUCKDB_HLL_REGISTERS = 64
+
+# Registers used by Polars' approx_n_unique (fixed by the engine)
+POLARS_HLL_REGISTERS = 1 << 14
+
+# Engines available for the metrics (and, for Polars, category tagging)
+ANALYTICS_BACKENDS = ['pandas'] + [
+    name for name, module in (('DuckDB', duckdb), ('Polars', pl)) if module is not None and pa is not None
+]
+
+# Bump whenever the processed DataFrame layout changes
+SNAPSHOT_SCHEMA_VERSION = 4
 
 # Add page configuration at the start
 st.set_page_config(
@@ -15,66 +159,894 @@ st.set_page_config(
     layout="wide"
 )
 
-def process_conversations(data):
-    conversation_details = []
+def iter_conversations(uploaded_file):
+    # Stream conversations one by one instead of loading the whole export
+    if ijson is None:
+        yield from json.load(uploaded_file)['conversations']
+        return
+    yield from ijson.items(uploaded_file, 'conversations.item', use_float=True)
+
+def conversation_key(conversation):
+    # Conversations without an id fall back to their creation time, which is stable across exports
+    conversation_id = conversation.get('id')
+    return str(conversation_id if conversation_id is not None else conversation['created_at'])
+
+def conversation_version(conversation):
+    # Changes whenever a conversation receives new messages
+    last_message_at = conversation.get('last_message_at') or conversation.get('updated_at')
+    if last_message_at is not None:
+        return str(last_message_at)
+    return f"{conversation['created_at']}#{len(conversation['messages'])}"
+
+class ConversationColumns:
+    # Accumulates typed per-conversation columns and builds a row batch in one step
+    def __init__(self):
+        self.countries = {}  # country -> categorical code, shared across batches
+        self.emitted = 0
+        self.reset()
     
-    for conversation in data['conversations']:
-        # Format the date
-        created_at = datetime.strptime(conversation['created_at'].split('+')[0], "%Y-%m-%dT%H:%M:%S.%f")
-        formatted_date = created_at.strftime("%B %d, %Y %H:%M:%S")
-        
+    def reset(self):
+        self.conversation_ids = []
+        self.visitor_ids = []
+        self.created_at = []
+        self.country_codes = []
+        self.responses = []
+        self.scores = []
+        self.question_counts = []
+        self.questions = []
+    
+    def __len__(self):
+        return len(self.questions)
+    
+    def add(self, conversation):
+        # Single pass over messages: collect questions and keep the last assistant response
+        questions = []
         last_assistant_response = None
-        last_assistant_score = "N/A"
-        
-        # First, find the last assistant response
+        last_assistant_score = None
         for message in conversation['messages']:
-            if message.get('role') == 'assistant' and message.get('type') == 'text':
+            role = message.get('role')
+            if role == 'user':
+                questions.append(message.get('content'))
+            elif role == 'assistant' and message.get('type') == 'text':
                 last_assistant_response = message.get('content')
-                last_assistant_score = message.get('score', "N/A")
+                last_assistant_score = message.get('score')
         
-        # Then collect all user questions
-        for message in conversation['messages']:
-            if message.get('role') == 'user':
-                user_question = message.get('content')
-                conversation_details.append({
-                    'S.No': len(conversation_details) + 1,
-                    'Asked at': formatted_date,  # Changed from 'Created At'
-                    'Country': conversation['country'],
-                    'User Question': user_question,
-                    'Assistant Response': last_assistant_response,
-                    'Score': last_assistant_score
-                })
-    
-    return pd.DataFrame(conversation_details)
-
-def get_daily_metrics(df):
-    # Convert to datetime if not already
-    df['Date'] = pd.to_datetime(df['Asked at']).dt.date  # Changed from 'Created At'
-    
-    # Get daily question count
-    daily_questions = df.groupby('Date').agg({
-        'User Question': 'count'  # Count questions per day
-    }).reset_index()
-    daily_questions.columns = ['Date', 'Questions']
-    
-    # Get daily unique users (countries)
-    daily_users = df.groupby('Date').agg({
-        'Country': 'nunique'  # Count unique countries per day
-    }).reset_index()
-    daily_users.columns = ['Date', 'Users']
-    
-    # Merge metrics
-    daily_metrics = pd.merge(daily_questions, daily_users, on='Date')
-    return daily_metrics
-
-def get_country_metrics(df):
-    # Get metrics by country
-    country_metrics = df.groupby('Country').agg({
-        'User Question': 'count',  # Count of questions
-        'Asked at': 'nunique'      # Count of unique timestamps for users
-    }).reset_index()
+        if not questions:
+            return
+        
+        # Visitors default to their conversation when the export has no visitor id
+        conversation_id = conversation_key(conversation)
+        visitor_id = next(
+            (conversation[field] for field in VISITOR_ID_FIELDS if conversation.get(field) is not None),
+            conversation_id
+        )
+        
+        country = conversation['country']
+        if country is None:
+            code = -1
+        else:
+            code = self.countries.setdefault(country, len(self.countries))
+        
+        self.conversation_ids.append(conversation_id)
+        self.visitor_ids.append(str(visitor_id))
+        self.created_at.append(conversation['created_at'])
+        self.country_codes.append(code)
+        self.responses.append(last_assistant_response)
+        self.scores.append(np.nan if last_assistant_score is None else last_assistant_score)
+        self.question_counts.append(len(questions))
+        self.questions.extend(questions)
+    
+    def build(self):
+        counts = np.asarray(self.question_counts, dtype=np.int64)
+        # Parse all timestamps of the batch in one vectorized pass (int64 ns since epoch)
+        created_at = pd.to_datetime(pd.Series(self.created_at, dtype=object), format='ISO8601', utc=True)
+        created_ns = created_at.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        
+        country_codes = np.asarray(self.country_codes, dtype=np.int32)
+        scores = np.asarray(self.scores, dtype=np.float64)
+        # Responses are pooled: each distinct text is stored once and rows hold its integer code
+        response_codes, response_pool = pd.factorize(np.asarray(self.responses, dtype=object))
+        # Ids become categorical codes so distinct counts work on integers
+        conversation_codes, conversation_ids = pd.factorize(np.asarray(self.conversation_ids, dtype=object))
+        visitor_codes, visitor_ids = pd.factorize(np.asarray(self.visitor_ids, dtype=object))
+        
+        # Pools are always TEXT_DTYPE, even when empty (a batch with no replies or countries)
+        def categorical(codes, pool):
+            return pd.Categorical.from_codes(np.repeat(codes, counts), categories=pd.Index(pool, dtype=TEXT_DTYPE))
+        
+        batch = pd.DataFrame({
+            'S.No': np.arange(self.emitted + 1, self.emitted + len(self) + 1, dtype=np.int32),
+            'Asked at': pd.to_datetime(np.repeat(created_ns, counts), unit='ns', utc=True),
+            'Country': categorical(country_codes, list(self.countries)),
+            'User Question': pd.array(self.questions, dtype=TEXT_DTYPE),
+            'Assistant Response': categorical(response_codes, response_pool),
+            'Score': pd.array(np.repeat(scores, counts), dtype='Float32'),  # nullable: missing scores are NA
+            'Conversation': categorical(conversation_codes, conversation_ids),
+            'Visitor': categorical(visitor_codes, visitor_ids),
+        })
+        self.emitted += len(self)
+        self.reset()
+        return batch
+
+def iter_row_batches(conversations, batch_size=INGEST_BATCH_SIZE):
+    columns = ConversationColumns()
+    
+    for conversation in conversations:
+        columns.add(conversation)
+        # Emit a batch once it is full so memory stays bounded by batch_size
+        if len(columns) >= batch_size:
+            yield columns.build()
+    
+    if len(columns) or not columns.emitted:
+        yield columns.build()
+
+# Free text is kept in Arrow-backed strings when pyarrow is available
+TEXT_DTYPE = pd.StringDtype('pyarrow') if pa is not None else object
+
+# Columns stored as integer codes into a pool of distinct values
+CATEGORICAL_COLUMNS = ('Country', 'Assistant Response', 'Conversation', 'Visitor')
+
+def process_conversations(data, batch_size=INGEST_BATCH_SIZE):
+    # Accept either a parsed export or an iterable of conversations
+    conversations = data['conversations'] if isinstance(data, dict) else data
+    return concat_rows(list(iter_row_batches(conversations, batch_size)))
+
+def text_categories(values):
+    # Same codes over a TEXT_DTYPE pool; an empty or reloaded pool may carry another string dtype
+    values = values.astype('category')
+    return pd.Categorical.from_codes(values.cat.codes, categories=pd.Index(values.cat.categories, dtype=TEXT_DTYPE))
+
+def concat_rows(batches):
+    df = pd.concat(batches, ignore_index=True)
+    # Batches carry their own category lists, so unify them into one set of codes
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = union_categoricals([text_categories(batch[column]) for batch in batches])
+    return df
+
+def content_hash(uploaded_file, chunk_size=1 << 20):
+    # Hash the uploaded bytes so identical exports share cache entries regardless of file name
+    digest = hashlib.blake2b(digest_size=16)
+    uploaded_file.seek(0)
+    for chunk in iter(lambda: uploaded_file.read(chunk_size), b''):
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+class ParseCache:
+    # LRU of processed DataFrames (or arrays) keyed by content hash, bounded by entry count and total bytes
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            df = self.entries.get(key)
+            if df is not None:
+                self.entries.move_to_end(key)
+            return df
+    
+    def put(self, key, df):
+        size = int(df.nbytes) if isinstance(df, np.ndarray) else int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes or self.max_entries < 1:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.sizes[key]
+            self.entries[key] = df
+            self.entries.move_to_end(key)
+            self.sizes[key] = size
+            self.total_bytes += size
+            # Evict least recently used exports until both bounds hold
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                evicted, _ = self.entries.popitem(last=False)
+                self.total_bytes -= self.sizes.pop(evicted)
+
+@st.cache_resource
+def get_parse_cache():
+    return ParseCache(PARSE_CACHE_MAX_ENTRIES, PARSE_CACHE_MAX_BYTES)
+
+def get_file_hash(uploaded_file):
+    # Hash each upload once per session; reruns reuse the stored digest
+    file_id = getattr(uploaded_file, 'file_id', None) or uploaded_file.name
+    hashes = st.session_state.setdefault('file_hashes', {})
+    if file_id not in hashes:
+        hashes[file_id] = content_hash(uploaded_file)
+    return hashes[file_id]
+
+def snapshot_path(file_hash):
+    # The schema version keeps snapshots from older layouts from being loaded
+    return os.path.join(SNAPSHOT_DIR, f"{file_hash}.v{SNAPSHOT_SCHEMA_VERSION}.arrow")
+
+def write_arrow(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    # Atomic rename so concurrent sessions never read a half-written file
+    os.replace(tmp_path, path)
+
+def disk_usage(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def prune_directory(directory, max_entries, max_bytes, keep=None):
+    # File-system LRU over cached files (or directories): mtime is bumped on every reuse,
+    # so the oldest mtimes go first until both bounds hold. keep is never removed
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.tmp') or entry.path == keep:
+            continue
+        try:
+            entries.append((entry.stat().st_mtime_ns, disk_usage(entry.path), entry.path))
+        except FileNotFoundError:  # pruned by another session
+            pass
+    entries.sort()
+    count = len(entries) + (keep is not None)
+    total = sum(size for _, size, _ in entries) + (disk_usage(keep) if keep is not None else 0)
+    for _, size, path in entries:
+        if count <= max_entries and total <= max_bytes:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        count, total = count - 1, total - size
+
+def read_arrow(path):
+    if pa is None or not os.path.exists(path):
+        return None
+    # Memory-map the Arrow file so loading does not copy it through Python
+    source = pa.memory_map(path, 'r')
+    return pa.ipc.open_file(source).read_all().to_pandas()
+
+def write_snapshot(df, file_hash):
+    if pa is not None:
+        path = snapshot_path(file_hash)
+        write_arrow(df, path)
+        prune_directory(SNAPSHOT_DIR, SNAPSHOT_MAX_FILES, SNAPSHOT_MAX_BYTES, keep=path)
+
+def read_snapshot(file_hash):
+    df = read_arrow(snapshot_path(file_hash))
+    if df is not None:
+        try:
+            os.utime(snapshot_path(file_hash))  # most recently used
+        except FileNotFoundError:  # pruned meanwhile; the mapping stays valid
+            pass
+    return df
+
+def load_conversations(uploaded_file, file_hash):
+    cache = get_parse_cache()
+    df = cache.get(file_hash)
+    if df is None:
+        df = read_snapshot(file_hash)
+        if df is None:
+            df = process_conversations(iter_conversations(uploaded_file))
+            try:
+                write_snapshot(df, file_hash)
+            except OSError as e:
+                st.warning(f"Could not save snapshot: {str(e)}")
+        cache.put(file_hash, df)
+    # Shallow copy so per-session column additions never leak into the shared cache
+    return df.copy(deep=False)
+
+# Additive measures kept per cube cell
+CUBE_MEASURES = ['questions', 'score_sum', 'score_count', 'conversations']
+
+def get_day_keys(df):
+    # Integer day keys (days since epoch, UTC) straight from the datetime column
+    return df['Asked at'].values.astype('datetime64[D]').view(np.int64)
+
+def bit_length(values):
+    # Exact bit length of uint64 values (a float log2 would round near 2**53)
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        wide = values >= (np.uint64(1) << np.uint64(shift))
+        lengths[wide] += shift
+        values[wide] >>= np.uint64(shift)
+    return lengths + (values > 0)
+
+def hll_estimate(inverse_sum, zeros, precision):
+    # Standard HyperLogLog estimate with linear counting for small cardinalities
+    m = 1 << precision
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / inverse_sum
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+def hash_categorical(values):
+    # Stable 64-bit hash per row, computed once per distinct value and broadcast through the codes
+    category_hashes = pd.util.hash_array(np.asarray(values.cat.categories, dtype=object), categorize=False)
+    return category_hashes[values.cat.codes.to_numpy()]
+
+def key_mask(frame, keys):
+    # Rows of frame whose key columns appear in keys (missing values match each other)
+    matched = frame.merge(keys.drop_duplicates(), how='left', on=list(keys.columns), indicator=True)['_merge']
+    return (matched == 'both').to_numpy()
+
+def sparse_registers(cells, hashes, precision):
+    # HyperLogLog registers per cell, keeping only the non-empty (cell, register) pairs; a
+    # cell never holds more than 2**precision of them however many visitors it has
+    suffix_bits = 64 - precision
+    suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+    entries = pd.DataFrame({
+        'cell': np.asarray(cells, dtype=np.int32),
+        'register': (hashes >> np.uint64(suffix_bits)).astype(np.int16 if precision < 16 else np.int32),
+        'rank': (suffix_bits + 1 - bit_length(suffix)).astype(np.uint8),
+    })
+    return entries.groupby(['cell', 'register'], sort=False)['rank'].max().reset_index()
+
+class RollupCube:
+    # Measures pre-aggregated per (day, country[, category]) cell, so every tab slices cells
+    # instead of regrouping rows. A conversation lives in a single day and country, so its
+    # count is additive; distinct visitors are mergeable per-cell HyperLogLog registers.
+    # Exact distinct visitors need the opt-in member table of (cell, visitor) pairs.
+    backend = 'pandas'
+    
+    def __init__(self, cells, sketch, members=None, precision=HLL_PRECISION):
+        self.cells = cells
+        self.sketch = sketch
+        self.members = members
+        self.precision = precision
+    
+    @staticmethod
+    def cell_keys(df):
+        dims = {'day': get_day_keys(df), 'Country': df['Country'].to_numpy()}
+        if 'Category' in df:
+            dims['Category'] = df['Category'].to_numpy()
+        return pd.DataFrame(dims)
+    
+    @classmethod
+    def from_frame(cls, df, exact=False, precision=HLL_PRECISION):
+        frame = cls.cell_keys(df)
+        dims = list(frame.columns)
+        frame['question'] = df['User Question'].notna().to_numpy()
+        frame['score'] = df['Score'].to_numpy(dtype=np.float64, na_value=np.nan)
+        frame['conversation'] = df['Conversation'].cat.codes.to_numpy()
+        
+        grouped = frame.groupby(dims, observed=True, sort=False, dropna=False)
+        cells = grouped.agg(
+            questions=('question', 'sum'),
+            score_sum=('score', 'sum'),
+            score_count=('score', 'count'),
+            conversations=('conversation', 'nunique')
+        ).reset_index()
+        cell_ids = grouped.ngroup().to_numpy()
+        visitors = hash_categorical(df['Visitor'])
+        members = None
+        if exact:
+            members = pd.DataFrame({'cell': cell_ids, 'visitor': visitors}).drop_duplicates(ignore_index=True)
+        return cls(cells, sparse_registers(cell_ids, visitors, precision), members, precision)
+    
+    @property
+    def dims(self):
+        return [column for column in self.cells.columns if column not in CUBE_MEASURES]
+    
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(1 << self.precision)
+    
+    def combine(self, other):
+        # Add another cube's rows: measures add up (both cubes must cover whole conversations),
+        # registers merge by maximum. The result has a member table only when both sides do
+        grouped = pd.concat([self.cells, other.cells], ignore_index=True).groupby(self.dims, sort=False, dropna=False)
+        cells = grouped[CUBE_MEASURES].sum().reset_index()
+        cell_ids = grouped.ngroup().to_numpy()
+        
+        def renumbered(table, offset):
+            return table.assign(cell=cell_ids[offset + table['cell'].to_numpy()].astype(np.int32))
+        
+        sketch = pd.concat([renumbered(self.sketch, 0), renumbered(other.sketch, len(self.cells))])
+        sketch = sketch.groupby(['cell', 'register'], sort=False)['rank'].max().reset_index()
+        members = None
+        if self.members is not None and other.members is not None:
+            members = pd.concat([renumbered(self.members, 0), renumbered(other.members, len(self.cells))])
+            members = members.drop_duplicates(ignore_index=True)
+        return RollupCube(cells, sketch, members, self.precision)
+    
+    def without(self, keys):
+        # Same cube minus the cells listed in keys (a frame of dims). Registers cannot be
+        # subtracted, so callers rebuild those cells from the rows that remain
+        keep = ~key_mask(self.cells[self.dims], keys)
+        renumber = np.full(len(self.cells), -1, dtype=np.int32)
+        renumber[keep] = np.arange(int(keep.sum()), dtype=np.int32)
+        
+        def kept(table):
+            cells = table['cell'].to_numpy()
+            table = table[keep[cells]]
+            return table.assign(cell=renumber[table['cell'].to_numpy()]).reset_index(drop=True)
+        
+        members = None if self.members is None else kept(self.members)
+        return RollupCube(self.cells[keep].reset_index(drop=True), kept(self.sketch), members, self.precision)
+    
+    def day_where(self, days, where=None):
+        # Cell mask of a day range, combined with an optional existing mask
+        if days is None:
+            return where
+        in_range = day_mask(self.cells['day'].to_numpy(), days)
+        return in_range if where is None else where & in_range
+    
+    def _groups(self, table, by, where):
+        # Rows of a per-cell table restricted to where, with integer group codes looked up
+        # per cell (so grouping never hashes the dimension values of every row)
+        cells = table['cell'].to_numpy()
+        if where is not None:
+            keep = where[cells]
+            table, cells = table[keep], cells[keep]
+        keys = self.cells[by].to_numpy() if by else np.zeros(len(self.cells), dtype=np.int8)
+        cell_groups, group_keys = pd.factorize(keys, use_na_sentinel=False)
+        return table, cell_groups[cells], group_keys
+    
+    def distinct_conversations(self, by=None, where=None, days=None):
+        where = self.day_where(days, where)
+        cells = self.cells if where is None else self.cells[where]
+        if not by:
+            return int(cells['conversations'].sum())
+        return cells.groupby(by)['conversations'].sum()
+    
+    def distinct_users(self, by=None, approximate=False, where=None, days=None):
+        # where is an optional boolean mask over cells, e.g. a country subset
+        where = self.day_where(days, where)
+        if not approximate:
+            if self.members is None:
+                raise ValueError("exact distinct users need a cube built with exact=True")
+            table, groups, group_keys = self._groups(self.members, by, where)
+            counts = table.groupby(groups)['visitor'].nunique()
+            counts = pd.Series(counts.to_numpy(), index=group_keys[counts.index.to_numpy()])
+            return counts if by else int(counts.sum())
+        
+        # Merge the registers of every cell in a group into one dense row per group
+        table, groups, group_keys = self._groups(self.sketch, by, where)
+        m = 1 << self.precision
+        merged = np.zeros(len(group_keys) * m, dtype=np.uint8)
+        np.maximum.at(merged, groups * m + table['register'].to_numpy(), table['rank'].to_numpy())
+        merged = merged.reshape(len(group_keys), m)
+        present = np.bincount(groups, minlength=len(group_keys)) > 0
+        merged, group_keys = merged[present], group_keys[present]
+        zeros = np.count_nonzero(merged == 0, axis=1)
+        estimates = hll_estimate(np.exp2(-merged.astype(np.float64)).sum(axis=1), zeros, self.precision)
+        counts = pd.Series(np.round(estimates).astype(np.int64), index=group_keys)
+        return counts if by else int(counts.sum())
+
+@st.cache_resource(max_entries=PARSE_CACHE_MAX_ENTRIES)
+def get_rollup_cube(file_hash, exact, _df):
+    # Built once per export; _df is not hashed by Streamlit, file_hash identifies it.
+    # Only exact distinct counts pay for the member table
+    return RollupCube.from_frame(_df, exact=exact)
+
+class ConversationStore:
+    # Local store of ingested conversations: processed rows, the version of every
+    # conversation (so unchanged ones are skipped on the next upload) and the rollup cube
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        meta_path = os.path.join(path, 'meta.json')
+        self.meta = {'ingested': []}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        self.rows = read_arrow(self._file('rows'))
+        versions = read_arrow(self._file('versions'))
+        self.versions = {} if versions is None else dict(zip(versions['id'], versions['version']))
+        cells, sketch = read_arrow(self._file('cube_cells')), read_arrow(self._file('cube_sketch'))
+        self.cube = None
+        if sketch is not None and set(CUBE_MEASURES) <= set(cells.columns):
+            self.cube = RollupCube(cells, sketch)
+        elif self.rows is not None:  # written by an older layout
+            self.cube = RollupCube.from_frame(self.rows)
+    
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.arrow")
+    
+    def _record(self, file_hash):
+        self.meta['ingested'] = self.meta['ingested'] + [file_hash]
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+    
+    def ingest(self, uploaded_file, file_hash):
+        with self.lock:
+            changed = {}
+            
+            def new_or_changed(conversations):
+                for conversation in conversations:
+                    key, version = conversation_key(conversation), conversation_version(conversation)
+                    if self.versions.get(key) != version:
+                        changed[key] = version
+                        yield conversation
+            
+            new_rows = process_conversations(new_or_changed(iter_conversations(uploaded_file)))
+            replaced = [key for key in changed if key in self.versions]
+            if not changed:
+                # Nothing new (the usual overlapping daily export): only remember the upload
+                self._record(file_hash)
+                return 0, 0
+            
+            if self.rows is None:
+                rows, cube = new_rows, RollupCube.from_frame(new_rows)
+            else:
+                # Cells holding old rows of changed conversations are rebuilt from the rows they
+                # keep, then the new rows are added
+                removed = self.rows['Conversation'].isin(replaced).to_numpy()
+                kept = self.rows[~removed]
+                touched = RollupCube.cell_keys(self.rows[removed])
+                rebuilt = RollupCube.from_frame(kept[key_mask(RollupCube.cell_keys(kept), touched)])
+                cube = self.cube.without(touched).combine(rebuilt).combine(RollupCube.from_frame(new_rows))
+                rows = concat_rows([kept, new_rows])
+                rows['S.No'] = np.arange(1, len(rows) + 1, dtype=np.int32)
+            
+            versions = {**self.versions, **changed}
+            write_arrow(rows, self._file('rows'))
+            write_arrow(pd.DataFrame({'id': list(versions), 'version': list(versions.values())}), self._file('versions'))
+            write_arrow(cube.cells, self._file('cube_cells'))
+            write_arrow(cube.sketch, self._file('cube_sketch'))
+            self._record(file_hash)
+            
+            self.rows, self.versions, self.cube = rows, versions, cube
+            return len(changed) - len(replaced), len(replaced)
+
+@st.cache_resource
+def get_conversation_store():
+    return ConversationStore(STORE_DIR)
+
+def budget_batch_size(memory_budget_mb=MEMORY_BUDGET_MB):
+    # Rows per batch so that one batch's working set fits in the memory budget
+    return max(memory_budget_mb * 1024 ** 2 // ROW_WORKING_BYTES, 1000)
+
+class SpillFile:
+    # A frame kept on disk as Parquet, written and read back one row group at a time
+    def __init__(self, path):
+        self.path = path
+    
+    def write(self, chunks):
+        write_columnar_chunks(chunks, self.path)
+    
+    def __len__(self):
+        return pa.parquet.ParquetFile(self.path).metadata.num_rows
+    
+    def iter_frames(self, columns=None):
+        parquet = pa.parquet.ParquetFile(self.path)
+        for i in range(parquet.num_row_groups):
+            yield parquet.read_row_group(i, columns=columns).to_pandas()
+    
+    def read_rows(self, start, stop):
+        # Only the row groups overlapping [start, stop) are read
+        parquet = pa.parquet.ParquetFile(self.path)
+        tables, offset = [], 0
+        for i in range(parquet.num_row_groups):
+            rows = parquet.metadata.row_group(i).num_rows
+            if offset < stop and offset + rows > start:
+                first = max(start - offset, 0)
+                tables.append(parquet.read_row_group(i).slice(first, min(stop - offset, rows) - first))
+            offset += rows
+        if not tables:
+            return parquet.schema_arrow.empty_table().to_pandas()
+        return pa.concat_tables(tables).to_pandas()
+
+def day_mask(day_keys, days):
+    # Day keys inside an inclusive (first, last) range; days=None selects everything
+    if days is None:
+        return np.ones(len(day_keys), dtype=bool)
+    return (day_keys >= days[0]) & (day_keys <= days[1])
+
+def range_key(data_key, days):
+    # Cache and export key of a data version restricted to a day range
+    return data_key if days is None else f"{data_key}-d{days[0]}-{days[1]}"
+
+# Hive-style day partitions of the out-of-core store: rows/day=YYYY-MM-DD/part-*.parquet
+DAY_PARTITIONING = pa.dataset.partitioning(pa.schema([('day', pa.date32())]), flavor='hive') if pa is not None else None
+
+class PartitionedRows:
+    # Rows stored as a Parquet dataset partitioned by day. A day range is turned into a
+    # partition filter, so directories outside it are pruned before any file is opened
+    def __init__(self, path, days=None):
+        self.path = path
+        self.days = days
+    
+    def write_batch(self, batch, number):
+        day = get_day_keys(batch).astype('datetime64[D]')
+        table = pa.Table.from_pandas(batch, preserve_index=False).append_column('day', pa.array(day))
+        # One file per day in the batch; Arrow's default caps of 1024 would reject long histories
+        partitions = max(len(np.unique(day)), 1)
+        pa.dataset.write_dataset(
+            table, self.path, format='parquet', partitioning=DAY_PARTITIONING,
+            basename_template=f"part-{number:05d}-{{i}}.parquet",  # batch number keeps export order within a day
+            existing_data_behavior='overwrite_or_ignore', preserve_order=True,
+            max_partitions=partitions, max_open_files=max(partitions, 1024),
+            file_options=pa.dataset.ParquetFileFormat().make_write_options(compression='zstd'),
+        )
+    
+    def fragments(self):
+        dataset = pa.dataset.dataset(self.path, format='parquet', partitioning=DAY_PARTITIONING)
+        selected = None
+        if self.days is not None:
+            first, last = (pa.scalar(int(day), pa.int32()).cast(pa.date32()) for day in self.days)
+            selected = (pa.compute.field('day') >= first) & (pa.compute.field('day') <= last)
+        # Paths sort by day, then by batch
+        return sorted(dataset.get_fragments(filter=selected), key=lambda fragment: fragment.path)
+    
+    def partition_count(self):
+        # (day partitions selected, day partitions stored)
+        selected = {os.path.dirname(fragment.path) for fragment in self.fragments()}
+        return len(selected), len(os.listdir(self.path))
+    
+    def __len__(self):
+        return sum(fragment.count_rows() for fragment in self.fragments())
+    
+    def iter_frames(self, columns=None, batch_size=None):
+        # Day files regrouped into budget-sized frames, in export order; a file per
+        # (day, batch) would be far too small to process or re-spill one at a time
+        batch_size = batch_size or budget_batch_size()
+        pending, rows = [], 0
+        for fragment in self.fragments():
+            for batch in fragment.to_batches(columns=columns):
+                pending.append(batch)
+                rows += batch.num_rows
+                while rows >= batch_size:
+                    table = pa.Table.from_batches(pending)
+                    yield table.slice(0, batch_size).to_pandas()
+                    pending, rows = table.slice(batch_size).to_batches(), rows - batch_size
+        if rows:
+            yield pa.Table.from_batches(pending).to_pandas()
+    
+    def read_rows(self, start, stop):
+        # Only the files overlapping [start, stop) are read; the rest contribute footer row counts
+        fragments = self.fragments()
+        tables, offset = [], 0
+        for fragment in fragments:
+            if offset >= stop:
+                break
+            rows = fragment.count_rows()
+            if offset + rows > start:
+                first = max(start - offset, 0)
+                tables.append(fragment.to_table().slice(first, min(stop - offset, rows) - first))
+            offset += rows
+        if tables:
+            return pa.concat_tables(tables).to_pandas()
+        if fragments:
+            return fragments[0].physical_schema.empty_table().to_pandas()
+        return pd.DataFrame()
+
+class SpilledConversations:
+    # Out-of-core form of a processed export: rows spilled as day partitions, one file per
+    # (day, ingestion batch), and the rollup cube merged from per-batch partial aggregates.
+    # Only one batch is in memory at a time; the cube grows with distinct conversations, not rows
+    def __init__(self, path, days=None, cube=None):
+        self.path = path
+        self.days = days
+        self.rows = PartitionedRows(os.path.join(path, 'rows'), days)
+        if cube is None:
+            cube = RollupCube(read_arrow(self._file('cube_cells')), read_arrow(self._file('cube_sketch')))
+        self.cube = cube
+    
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.arrow")
+    
+    @staticmethod
+    def write(conversations, path, batch_size):
+        rows = PartitionedRows(os.path.join(path, 'rows'))
+        cube = None
+        for number, batch in enumerate(iter_row_batches(conversations, batch_size)):
+            # Each partial is folded in as it arrives, so only the running cube is kept
+            partial = RollupCube.from_frame(batch)
+            cube = partial if cube is None else cube.combine(partial)
+            # Category pools differ per batch, so the spill stores plain strings
+            rows.write_batch(batch.astype({column: TEXT_DTYPE for column in CATEGORICAL_COLUMNS}), number)
+        write_arrow(cube.cells, os.path.join(path, 'cube_cells.arrow'))
+        write_arrow(cube.sketch, os.path.join(path, 'cube_sketch.arrow'))
+    
+    def select(self, days):
+        # Same spill restricted to a day range; shares the cube, which is filtered by day cells
+        return SpilledConversations(self.path, days, self.cube)
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def iter_frames(self, columns=None):
+        # Row groups back in the processed layout (categorical ids and pools)
+        for frame in self.rows.iter_frames(columns):
+            yield frame.astype({column: 'category' for column in CATEGORICAL_COLUMNS if column in frame})
+    
+    def read_rows(self, start, stop):
+        return self.rows.read_rows(start, stop)
+
+def load_spilled_conversations(uploaded_file, file_hash):
+    # Out-of-core counterpart of load_conversations: the export is streamed into a
+    # temporary directory once per content hash, then moved into place atomically
+    path = os.path.join(SPILL_DIR, f"{file_hash}.v{SPILL_LAYOUT_VERSION}")
+    if not os.path.isdir(path):
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=SPILL_DIR, suffix='.tmp')
+        try:
+            SpilledConversations.write(iter_conversations(uploaded_file), tmp_path, budget_batch_size())
+        except BaseException:  # a malformed export or a stopped rerun leaves nothing behind
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        try:
+            os.rename(tmp_path, path)
+        except OSError:  # another session finished the same export first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        prune_directory(SPILL_DIR, SPILL_MAX_ENTRIES, SPILL_MAX_BYTES, keep=path)
+    else:
+        os.utime(path)  # most recently used
+    return SpilledConversations(path)
+
+def analytics_table(df):
+    # Columns the metric engines read, as an Arrow table sharing the DataFrame's buffers.
+    # Ids are passed as their integer codes, so distinct counts compare integers
+    columns = {
+        'day': get_day_keys(df),
+        'Country': df['Country'],
+        'question': df['User Question'],
+        'score': df['Score'],
+        'visitor': df['Visitor'].cat.codes,
+        'conversation': df['Conversation'].cat.codes,
+    }
+    if 'Category' in df:
+        columns['Category'] = df['Category']
+    return pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+
+class DuckDBAnalytics:
+    # Metrics as SQL over the rows registered (zero-copy, via Arrow) in an embedded DuckDB,
+    # or over the Parquet files of an out-of-core spill. Exposes the same distinct-count interface as RollupCube for the Quick Statistics.
+    # Metric functions dispatch on .backend, not isinstance: every rerun redefines the
+    # classes while cached instances survive
+    backend = 'DuckDB'
+    relative_error = 1.04 / np.sqrt(DUCKDB_HLL_REGISTERS)
+    
+    def __init__(self, df):
+        os.makedirs(DUCKDB_TEMP_DIR, exist_ok=True)
+        self.connection = duckdb.connect(config={
+            'temp_directory': DUCKDB_TEMP_DIR,
+            'memory_limit': DUCKDB_MEMORY_LIMIT,
+        })
+        self.lock = threading.Lock()  # a connection must not run queries from two sessions at once
+        if isinstance(df, pd.DataFrame):
+            self.connection.register('rows', analytics_table(df))
+        else:
+            # Spilled rows are scanned from disk: the day filter prunes partition directories
+            # and only the columns a query names are read, so the export never has to fit in memory
+            files = os.path.join(df.rows.path, '**', '*.parquet').replace("'", "''")
+            self.connection.execute(f"""
+                CREATE VIEW rows AS
+                SELECT (day - DATE '1970-01-01')::INTEGER AS day, Country, "User Question" AS question,
+                       Score AS score, Visitor AS visitor, Conversation AS conversation
+                FROM read_parquet('{files}', hive_partitioning = true)
+            """)
+    
+    def query(self, sql):
+        with self.lock:
+            return self.connection.sql(sql).df()
     
-    country_metrics.columns = ['Country', 'Questions', 'Users']
+    @staticmethod
+    def count_users(approximate):
+        return 'approx_count_distinct(visitor)' if approximate else 'count(DISTINCT visitor)'
+    
+    @staticmethod
+    def in_days(days):
+        return 'TRUE' if days is None else f"day BETWEEN {int(days[0])} AND {int(days[1])}"
+    
+    def distinct_conversations(self, days=None):
+        sql = f"SELECT count(DISTINCT conversation) AS n FROM rows WHERE {self.in_days(days)}"
+        return int(self.query(sql)['n'].iloc[0])
+    
+    def distinct_users(self, approximate=False, days=None):
+        sql = f"SELECT {self.count_users(approximate)} AS n FROM rows WHERE {self.in_days(days)}"
+        return int(self.query(sql)['n'].iloc[0])
+    
+    def daily_metrics(self, approximate=False, days=None):
+        return self.query(f"""
+            SELECT day, count(question) AS Questions, {self.count_users(approximate)} AS Users,
+                   count(DISTINCT conversation) AS Conversations, avg(score) AS "Avg Score"
+            FROM rows WHERE {self.in_days(days)} GROUP BY day ORDER BY day
+        """)
+    
+    def country_metrics(self, approximate=False, days=None):
+        return self.query(f"""
+            SELECT Country, count(question) AS Questions, {self.count_users(approximate)} AS Users
+            FROM rows WHERE Country IS NOT NULL AND {self.in_days(days)} GROUP BY Country ORDER BY Country
+        """)
+    
+    def category_metrics(self):
+        return self.query("SELECT Category, count(question) AS Count FROM rows GROUP BY Category ORDER BY Category")
+
+class PolarsAnalytics:
+    # Metrics as Polars lazy queries over the Arrow rows: each query is planned with
+    # projection pushdown (only the columns it names are read) and runs on all cores
+    backend = 'Polars'
+    relative_error = 1.04 / np.sqrt(POLARS_HLL_REGISTERS)
+    
+    def __init__(self, df):
+        self.rows = pl.from_arrow(analytics_table(df)).lazy()
+    
+    @staticmethod
+    def collect(query):
+        # The streaming engine undercounts approx_n_unique when it merges partial sketches
+        return query.collect(engine='in-memory')
+    
+    @staticmethod
+    def count_users(approximate):
+        users = pl.col('visitor').approx_n_unique() if approximate else pl.col('visitor').n_unique()
+        return users.cast(pl.Int64)
+    
+    def in_days(self, days):
+        return self.rows if days is None else self.rows.filter(pl.col('day').is_between(days[0], days[1]))
+    
+    def distinct_conversations(self, days=None):
+        return self.collect(self.in_days(days).select(pl.col('conversation').n_unique())).item()
+    
+    def distinct_users(self, approximate=False, days=None):
+        return self.collect(self.in_days(days).select(self.count_users(approximate))).item()
+    
+    def daily_metrics(self, approximate=False, days=None):
+        return self.collect(self.in_days(days).group_by('day').agg(
+            pl.col('question').count().cast(pl.Int64).alias('Questions'),
+            self.count_users(approximate).alias('Users'),
+            pl.col('conversation').n_unique().cast(pl.Int64).alias('Conversations'),
+            pl.col('score').cast(pl.Float64).mean().alias('Avg Score'),
+        ).sort('day')).to_pandas()
+    
+    def country_metrics(self, approximate=False, days=None):
+        return self.collect(self.in_days(days).filter(pl.col('Country').is_not_null()).group_by(pl.col('Country').cast(pl.String)).agg(
+            pl.col('question').count().cast(pl.Int64).alias('Questions'),
+            self.count_users(approximate).alias('Users'),
+        ).sort('Country')).to_pandas()
+    
+    def category_metrics(self):
+        return self.collect(self.rows.group_by(pl.col('Category').cast(pl.String)).agg(
+            pl.col('question').count().cast(pl.Int64).alias('Count')
+        ).sort('Category')).to_pandas()
+
+def build_analytics(df, backend):
+    # Aggregation source the metric functions read from (DuckDB also reads spilled rows)
+    if backend == 'DuckDB':
+        return DuckDBAnalytics(df)
+    if backend == 'Polars':
+        return PolarsAnalytics(df)
+    return RollupCube.from_frame(df)
+
+@st.cache_resource(max_entries=PARSE_CACHE_MAX_ENTRIES)
+def get_backend_analytics(data_key, backend, _df):
+    return build_analytics(_df, backend)
+
+def get_daily_metrics(cube, approximate=False, days=None):
+    if cube.backend != 'pandas':
+        daily_metrics = cube.daily_metrics(approximate, days).set_index('day')
+        daily_metrics.insert(0, 'Date', pd.to_datetime(daily_metrics.index, unit='D').date)
+        return daily_metrics.reset_index(drop=True)
+    
+    # Per-day measures are sums over the cube's cells (only those in the day range)
+    cells = cube.cells[day_mask(cube.cells['day'].to_numpy(), days)]
+    daily_metrics = cells.groupby('day').agg(
+        Questions=('questions', 'sum'),
+        score_sum=('score_sum', 'sum'),
+        score_count=('score_count', 'sum')
+    )
+    daily_metrics['Users'] = cube.distinct_users('day', approximate, days=days)
+    daily_metrics['Conversations'] = cube.distinct_conversations('day', days=days)
+    daily_metrics['Avg Score'] = daily_metrics['score_sum'] / daily_metrics['score_count']
+    daily_metrics.insert(0, 'Date', pd.to_datetime(daily_metrics.index, unit='D').date)
+    return daily_metrics[['Date', 'Questions', 'Users', 'Conversations', 'Avg Score']].reset_index(drop=True)
+
+def get_country_metrics(cube, approximate=False, days=None):
+    if cube.backend != 'pandas':
+        # Rows arrive in country order like the groupby below, so ties in Questions rank the same
+        return cube.country_metrics(approximate, days).sort_values('Questions', ascending=False)
+    
+    # Get metrics by country
+    cells = cube.cells[day_mask(cube.cells['day'].to_numpy(), days)]
+    country_metrics = cells.groupby('Country', observed=True).agg(Questions=('questions', 'sum'))
+    country_metrics['Users'] = cube.distinct_users('Country', approximate, days=days)
+    country_metrics = country_metrics.reset_index()
     return country_metrics.sort_values('Questions', ascending=False)
 
 # Add these functions after your existing functions
@@ -84,57 +1056,720 @@ def get_country_metrics(df):
 #     genai.configure(api_key=GOOGLE_API_KEY)
 #     return genai.GenerativeModel('gemini-2.0-flash-thinking-exp-01-21')
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def analyze_question_category(question):
-    question = question.lower()
-    
-    # Check for Atlan branded questions
-    if "atlan" in question:
-        if any(word in question for word in ["what is", "what's", "define", "explain", "describe"]):
-            return "What is / Define (Branded)"
-        elif any(word in question for word in ["how to", "how do", "guide", "steps", "process"]):
-            return "FAQ / How to (Branded)"
-        return "Branded"  # fallback for other branded questions
-    
-    # Non-branded questions
-    if any(word in question for word in ["what is", "what's", "define", "explain", "describe"]):
-        return "What is / Define (Non branded)"
-    elif any(word in question for word in ["how to", "how do", "guide", "steps", "process"]):
-        return "FAQ / How to Type (Non branded)"
-    
-    return "Others"
-
-def analyze_batch_questions(questions, batch_size=250):
-    all_categories = []
-    for i in range(0, len(questions), batch_size):
-        batch = questions[i:i + batch_size]
-        batch_categories = [analyze_question_category(q) for q in batch]
-        all_categories.extend(batch_categories)
-        
-        progress = min((i + batch_size) / len(questions), 1.0)
-        yield progress, i + min(batch_size, len(questions) - i), all_categories
+def trie_pattern(words):
+    # Build a prefix-factored regex so each position is matched in O(keyword length)
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node):
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return f'(?:{body})?' if '' in node else body
+    
+    return build(trie)
+
+class CategoryRules:
+    # Compiled form of a category rule-set file (brands, ordered intents and labels)
+    def __init__(self, config, version):
+        self.config = config
+        self.version = version
+        brands = [word.lower() for word in config.get('brands', [])]
+        self.brand_pattern = trie_pattern(brands)
+        # Plain keyword lists for engines that match literals instead of regexes
+        self.brand_keywords = brands
+        self.intent_keywords = [[word.lower() for word in intent['keywords']] for intent in config.get('intents', [])]
+        self.intents = [
+            (trie_pattern([word.lower() for word in intent['keywords']]), intent['branded'], intent['non_branded'])
+            for intent in config.get('intents', [])
+        ]
+        self.branded_fallback = config.get('branded_fallback', "Branded")
+        self.fallback = config.get('fallback', "Others")
+
+def read_rules_file(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if path.endswith(('.yaml', '.yml')):
+        import yaml  # only needed for YAML rule files
+        return yaml.safe_load(raw), raw
+    return json.loads(raw), raw
+
+@st.cache_resource(max_entries=8)
+def compile_category_rules(path, mtime_ns):
+    # mtime_ns is part of the cache key, so editing the file is the only thing that recompiles
+    config, raw = read_rules_file(path)
+    return CategoryRules(config, hashlib.blake2b(raw, digest_size=8).hexdigest())
+
+def load_category_rules(path=None):
+    path = path or CATEGORY_RULES_PATH
+    return compile_category_rules(path, os.stat(path).st_mtime_ns)
+
+def keyword_mask(questions, pattern):
+    if not pattern:
+        return np.zeros(len(questions), dtype=bool)
+    return questions.str.contains(pattern, regex=True, na=False).to_numpy(dtype=bool)
+
+def classify_questions(questions, rules):
+    # Keyword masks combined with np.select: intents in rule-file order, brand mentions
+    # pick the branded label. Each keyword list is one trie-regex scan over the whole column
+    # in Arrow's regex engine; a single combined pattern would need a per-question Python
+    # loop (about 6x slower on 300k distinct questions), and a lookahead alternation only
+    # reports the longest keyword at each position
+    lowered = questions.astype('string').str.lower()
+    branded = keyword_mask(lowered, rules.brand_pattern)
+    intent_masks = [keyword_mask(lowered, pattern) for pattern, _, _ in rules.intents]
+    return np.select(
+        [branded & mask for mask in intent_masks] + [branded] + intent_masks,
+        [label for _, label, _ in rules.intents] + [rules.branded_fallback]
+        + [label for _, _, label in rules.intents],
+        default=rules.fallback
+    )
+
+def classify_questions_polars(questions, rules):
+    # Same labels as classify_questions, as one Polars expression: every keyword list is
+    # an Aho-Corasick scan and the chunk is split across Polars' thread pool
+    def mentions(words):
+        return pl.col('question').str.contains_any(words).fill_null(False) if words else pl.lit(False)
+    
+    branded = mentions(rules.brand_keywords)
+    intent_masks = [mentions(words) for words in rules.intent_keywords]
+    conditions = [branded & mask for mask in intent_masks] + [branded] + intent_masks
+    labels = ([label for _, label, _ in rules.intents] + [rules.branded_fallback]
+              + [label for _, _, label in rules.intents])
+    
+    expression = pl
+    for condition, label in zip(conditions, labels):
+        expression = expression.when(condition).then(pl.lit(label))
+    frame = pl.DataFrame({'question': pl.from_pandas(questions.astype(TEXT_DTYPE))}).with_columns(
+        pl.col('question').str.to_lowercase()
+    )
+    return frame.select(expression.otherwise(pl.lit(rules.fallback))).to_series().to_numpy()
 
-def get_category_metrics(df):
-    questions = df['User Question'].tolist()
+def analyze_batch_questions(questions, rules, batch_size=CATEGORY_CHUNK_SIZE, classify=classify_questions):
+    # Classify the Series chunk by chunk so callers can report progress
     total = len(questions)
-    final_categories = None
+    for i in range(0, total, batch_size):
+        processed = min(i + batch_size, total)
+        yield processed / total, processed, i, classify(questions.iloc[i:processed], rules)
+
+def classify_questions_from_config(questions, config, version):
+    # Worker entry point. Rules travel as their plain config: a cached CategoryRules belongs to
+    # the class object of the rerun that compiled it, which no longer pickles by reference
+    return classify_questions(questions, CategoryRules(config, version))
+
+def analyze_parallel_questions(questions, rules, batch_size=CATEGORY_CHUNK_SIZE, workers=CATEGORY_WORKERS):
+    # Shard the Series across worker processes; shards complete in any order and
+    # carry their start offset so the caller can reassemble them in original order
+    total = len(questions)
+    processed = 0
+    # Fork keeps the Streamlit script module visible to workers, so functions pickle by reference
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(max_workers=max(workers, 1), mp_context=context) as executor:
+        futures = {
+            executor.submit(classify_questions_from_config, questions.iloc[i:i + batch_size], rules.config, rules.version): i
+            for i in range(0, total, batch_size)
+        }
+        for future in as_completed(futures):
+            categories = future.result()
+            processed += len(categories)
+            yield processed / total, processed, futures[future], categories
+
+class CategoryMemo:
+    # Cross-session memo of question text hash -> category per rule-set version, bounded by
+    # entry count. Lookups are vectorized hash-index probes; every probe stamps the entries
+    # it hits, and the entries with the oldest stamps are evicted first
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.tables = {}  # version -> (hash index, categories, last-used stamps)
+        self.clock = 0
+        self.lock = threading.Lock()
+    
+    def get_many(self, version, hashes):
+        found = np.full(len(hashes), None, dtype=object)
+        with self.lock:
+            if version not in self.tables:
+                return found
+            index, categories, used = self.tables[version]
+            positions = index.get_indexer(hashes)
+            hits = positions >= 0
+            self.clock += 1
+            used[positions[hits]] = self.clock
+            found[hits] = categories[positions[hits]]
+        return found
+    
+    def put_many(self, version, hashes, categories):
+        with self.lock:
+            self.clock += 1
+            index, known, used = self.tables.get(
+                version, (pd.Index([], dtype=np.uint64), np.empty(0, dtype=object), np.empty(0, dtype=np.int64))
+            )
+            # Another session may have stored some of the same questions meanwhile
+            new = (index.get_indexer(hashes) < 0) & ~pd.Index(hashes).duplicated()
+            self.tables[version] = (
+                index.append(pd.Index(hashes[new])),
+                np.concatenate([known, np.asarray(categories, dtype=object)[new]]),
+                np.concatenate([used, np.full(int(new.sum()), self.clock, dtype=np.int64)]),
+            )
+            self._evict()
+    
+    def _evict(self):
+        sizes = {version: len(table[0]) for version, table in self.tables.items()}
+        excess = sum(sizes.values()) - self.max_entries
+        if excess <= 0:
+            return
+        # Oldest stamps across every version go first
+        stamps = np.concatenate([table[2] for table in self.tables.values()])
+        evicted = np.zeros(len(stamps), dtype=bool)
+        evicted[np.argsort(stamps, kind='stable')[:excess]] = True
+        offsets = np.cumsum([0] + list(sizes.values()))
+        for (version, (index, categories, used)), start, stop in zip(list(self.tables.items()), offsets, offsets[1:]):
+            keep = ~evicted[start:stop]
+            if not keep.any():
+                del self.tables[version]
+            elif not keep.all():
+                self.tables[version] = (index[keep], categories[keep], used[keep])
+
+@st.cache_resource
+def get_category_memo():
+    return CategoryMemo(CATEGORY_MEMO_MAX_ENTRIES)
+
+def categorize_questions(df, rules, parallel=False, backend='pandas'):
+    # Classify each distinct normalized question once and broadcast back through the codes
+    normalized = df['User Question'].astype('string').str.lower().str.strip()
+    codes, uniques = pd.factorize(normalized)
+    uniques = np.asarray(uniques, dtype=object)
+    occurrences = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    
+    memo = get_category_memo()
+    hashes = pd.util.hash_array(uniques, categorize=False)  # uniques are distinct already
+    unique_categories = memo.get_many(rules.version, hashes)
+    pending = np.flatnonzero(pd.isna(unique_categories))
+    
+    total = len(pending)
+    partial_counts = pd.Series(dtype='int64')
+    if backend == 'Polars':
+        # Polars is multi-threaded already, and its thread pool must not be forked
+        analyze = partial(analyze_batch_questions, classify=classify_questions_polars)
+    else:
+        analyze = analyze_parallel_questions if parallel else analyze_batch_questions
     
     with st.spinner('Analyzing questions in batches... This may take a while.'):
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        for progress, processed, categories in analyze_batch_questions(questions):
-            final_categories = categories
+        for progress, processed, start, categories in analyze(pd.Series(uniques[pending], dtype='string'), rules):
+            # Shards carry their start offset, so placement does not depend on completion order
+            positions = pending[start:start + len(categories)]
+            unique_categories[positions] = categories
+            partial_counts = partial_counts.add(
+                pd.Series(occurrences[positions]).groupby(categories).sum(), fill_value=0
+            )
             progress_bar.progress(progress)
-            status_text.write(f"Processed {processed} of {total} questions")
+            status_text.write(
+                f"Processed {processed} of {total} new distinct questions — "
+                + ", ".join(f"{name}: {int(count)}" for name, count in partial_counts.sort_values(ascending=False).items())
+            )
+        progress_bar.progress(1.0)
+    
+    memo.put_many(rules.version, hashes[pending], unique_categories[pending])
+    # Missing questions (code -1) fall through to the rule set's fallback; the column
+    # stays categorical so labels are not repeated per row
+    category_codes, labels = pd.factorize(np.append(unique_categories, rules.fallback))
+    df['Category'] = pd.Categorical.from_codes(category_codes[codes], categories=labels)
+    return df
+
+def categorize_spilled(spilled, rules, parallel=False, backend='pandas'):
+    # Out-of-core category analysis: classify one spilled batch at a time, fold its partial
+    # category cube into a running one and spill the per-question labels next to the rows
+    cube = None
+    progress = st.empty()
+    
+    def label_batches(frames):
+        nonlocal cube
+        for frame in frames:
+            with progress.container():
+                frame = categorize_questions(frame, rules, parallel=parallel, backend=backend)
+            partial = RollupCube.from_frame(frame)
+            cube = partial if cube is None else cube.combine(partial)
+            yield pd.DataFrame({
+                'S.No': frame['S.No'],
+                'User Question': frame['User Question'],
+                'Category': frame['Category'].astype(TEXT_DTYPE),
+            })
     
-    df['Category'] = final_categories
-    # Calculate counts and percentages
-    category_metrics = df.groupby('Category')['User Question'].count().reset_index(name='Count')
+    columns = ['S.No', 'Asked at', 'Country', 'User Question', 'Score', 'Conversation', 'Visitor']
+    name = range_key(f"categories_{rules.version}", spilled.days)
+    question_details = SpillFile(os.path.join(spilled.path, f"{name}.parquet"))
+    question_details.write(label_batches(spilled.iter_frames(columns)))
+    progress.empty()
+    return get_category_metrics(cube), question_details
+
+def get_category_metrics(cube):
+    if cube.backend != 'pandas':
+        category_metrics = cube.category_metrics()
+    else:
+        # Calculate counts and percentages from the category cells of the cube
+        category_metrics = cube.cells.groupby('Category')['questions'].sum().reset_index(name='Count')
     category_metrics['Percentage'] = (category_metrics['Count'] / category_metrics['Count'].sum() * 100).round(2)
     category_metrics['Percentage'] = category_metrics['Percentage'].astype(str) + '%'
     category_metrics = category_metrics.sort_values('Count', ascending=False)
-    return category_metrics, df
+    return category_metrics
+
+def iter_chunks(df):
+    # Slices of a DataFrame, or frames copied out of a data view or read back from a spill
+    if hasattr(df, 'iter_frames'):
+        yield from df.iter_frames()
+        return
+    for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+def write_csv_chunks(df, path, compress=False, **to_csv_kwargs):
+    # Serialize chunk by chunk into a file so the CSV never exists as one Python string
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    opener = gzip.open if compress else open
+    with opener(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(iter_chunks(df)):
+            chunk.to_csv(f, header=i == 0, **to_csv_kwargs)
+    os.replace(tmp_path, path)
+
+def write_columnar_chunks(chunks, path, export_format='Parquet (zstd)'):
+    # Columnar file straight from the typed columns: one zstd Parquet row group, or one
+    # Arrow IPC record batch, per chunk. The first chunk fixes the schema
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                if export_format == 'Parquet (zstd)':
+                    writer = pa.parquet.ParquetWriter(tmp_path, schema, compression='zstd')
+                else:
+                    writer = pa.ipc.new_file(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+
+def write_export(df, path, export_format, index=False, **to_csv_kwargs):
+    if export_format in ('CSV', 'CSV (gzip)'):
+        write_csv_chunks(df, path, compress=export_format == 'CSV (gzip)', index=index, **to_csv_kwargs)
+        return
+    # Columnar formats keep a meaningful index (e.g. S.No) as a regular column
+    if index:
+        df = df.reset_index()
+    write_columnar_chunks(iter_chunks(df), path, export_format)
+
+def lazy_export(version, name, df, export_format, **export_kwargs):
+    # Zero-argument callable for st.download_button: the file is only written when the
+    # user clicks, and later clicks for the same data version and format reuse it
+    extension, _ = EXPORT_FORMATS[export_format]
+    path = os.path.join(EXPORT_DIR, f"{name}_{version}{extension}")
+    
+    def export():
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            write_export(df, path, export_format, **export_kwargs)
+        prune_directory(EXPORT_DIR, EXPORT_MAX_FILES, EXPORT_MAX_BYTES, keep=path)
+        # Streamlit serves downloads from its in-memory media store, which takes bytes (a
+        # returned file is read whole too), so the finished file is held once while served
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    return export
+
+def export_download_button(label, version, name, df, export_format, **export_kwargs):
+    extension, mime = EXPORT_FORMATS[export_format]
+    st.download_button(
+        label=label,
+        data=lazy_export(version, name, df, export_format, **export_kwargs),
+        file_name=f'{name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}{extension}',
+        mime=mime,
+        help=f"Written to {EXPORT_DIR} in chunks; serving the download holds the whole file in memory",
+    )
+
+class DataView:
+    # Rows of a processed frame in display order, held as positions into the shared frame.
+    # Only the positions are cached; rows are copied out a page or an export chunk at a time
+    def __init__(self, df, positions):
+        self.df = df
+        self.positions = positions
+    
+    def __len__(self):
+        return len(self.positions)
+    
+    def column(self, name):
+        # One column in view order; S.No is the rank in the view
+        if name == 'S.No':
+            return pd.Series(np.arange(1, len(self) + 1, dtype=np.int32))
+        return self.df[name].take(self.positions).reset_index(drop=True)
+    
+    def take(self, ranks=None):
+        # Rows at the given ranks of the view (all of them by default), renumbered by rank
+        ranks = np.arange(len(self)) if ranks is None else np.asarray(ranks)
+        rows = self.df.take(self.positions[ranks])
+        rows['S.No'] = (ranks + 1).astype(np.int32)
+        return rows
+    
+    def iter_frames(self, columns=None):
+        for start in range(0, max(len(self), 1), EXPORT_CHUNK_ROWS):
+            rows = self.take(np.arange(start, min(start + EXPORT_CHUNK_ROWS, len(self))))
+            yield rows if columns is None else rows[columns]
+
+@st.cache_resource(max_entries=PARSE_CACHE_MAX_ENTRIES)
+def get_view_order(data_key, _df):
+    # Positions of the rows newest question first; shared read-only per data version
+    return _df['Asked at'].reset_index(drop=True).sort_values(ascending=False).index.to_numpy()
+
+@st.cache_resource(max_entries=PARSE_CACHE_MAX_ENTRIES)
+def get_date_range_order(data_key, days, _df, _order):
+    # The view order restricted to a day range; the full order is returned as is
+    if days is None:
+        return _order
+    return _order[day_mask(get_day_keys(_df)[_order], days)]
+
+@st.cache_data(max_entries=32)
+def cached_daily_metrics(data_key, backend, approximate, days, _cube):
+    return get_daily_metrics(_cube, approximate, days)
+
+@st.cache_data(max_entries=32)
+def cached_country_metrics(data_key, backend, approximate, days, _cube):
+    return get_country_metrics(_cube, approximate, days)
+
+# Columns the Full Data View can be sorted by on the server
+SORTABLE_COLUMNS = ['Asked at', 'S.No', 'Country', 'Score']
+
+@st.cache_resource
+def get_row_order_cache():
+    return ParseCache(ROW_ORDER_CACHE_MAX_ENTRIES, ROW_ORDER_CACHE_MAX_BYTES)
+
+def get_row_order(data_key, sort_column, ascending, countries, search, view):
+    # Ranks in the view of the filtered rows in display order; cached per data version and
+    # query, within a byte budget since every entry can be as long as the data
+    cache = get_row_order_cache()
+    key = (data_key, sort_column, ascending, countries, search)
+    order = cache.get(key)
+    if order is None:
+        order = sort_rows(view, sort_column, ascending, countries, search)
+        cache.put(key, order)
+    return order
+
+def sort_rows(view, sort_column, ascending, countries, search):
+    mask = np.ones(len(view), dtype=bool)
+    if countries:
+        mask &= view.column('Country').isin(countries).to_numpy()
+    if search:
+        mask &= view.column('User Question').str.contains(search, case=False, regex=False, na=False).to_numpy()
+    positions = np.flatnonzero(mask)
+    
+    values = view.column(sort_column).iloc[positions].reset_index(drop=True)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.set_categories(sorted(values.cat.categories))  # alphabetical, not first-seen
+    order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    # int32 ranks halve the cached bytes for any frame that fits in memory
+    return positions[order].astype(np.int32 if len(view) <= np.iinfo(np.int32).max else np.int64)
+
+@st.cache_data(max_entries=32)
+def cached_quick_statistics(data_key, backend, approximate, days, _view, _cube):
+    # _view holds only the rows of the day range; the cube is restricted by days
+    return {
+        'conversations': _cube.distinct_conversations(days=days),
+        'countries': len(_view.column('Country').unique()),
+        'score': _view.column('Score').mean(),
+        'users': _cube.distinct_users(approximate=approximate, days=days),
+    }
+
+@st.cache_data(max_entries=32)
+def cached_cube_statistics(data_key, approximate, days, _cube):
+    # Quick Statistics from the cube alone, for rows that are not in memory
+    cells = _cube.cells[day_mask(_cube.cells['day'].to_numpy(), days)]
+    return {
+        'conversations': _cube.distinct_conversations(days=days),
+        'countries': cells['Country'].nunique(dropna=False),
+        'score': cells['score_sum'].sum() / cells['score_count'].sum(),
+        'users': _cube.distinct_users(approximate=approximate, days=days),
+    }
+
+@st.cache_data(max_entries=32)
+def cached_memory_report(data_key, _df):
+    # Resident bytes per column, including the pools behind categorical columns
+    usage = _df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'Column': usage.index,
+        'Dtype': [str(_df[column].dtype) for column in usage.index],
+        'Bytes': usage.to_numpy(),
+    })
+    report['Bytes per row'] = (report['Bytes'] / max(len(_df), 1)).round(1)
+    return report
+
+@st.fragment
+def render_data_view(data_key, view, cube, backend, approximate, days, export_format):
+    # Sort and filter on the server, then send only the visible page to the browser
+    sort_col, order_col, country_col, search_col = st.columns([2, 1, 3, 3])
+    with sort_col:
+        sort_column = st.selectbox("Sort by", SORTABLE_COLUMNS)
+    with order_col:
+        ascending = st.selectbox("Order", ["Descending", "Ascending"]) == "Ascending"
+    with country_col:
+        countries = st.multiselect("Country", sorted(view.df['Country'].cat.categories))
+    with search_col:
+        search = st.text_input("Question contains")
+    
+    order = get_row_order(data_key, sort_column, ascending, tuple(countries), search, view)
+    size_col, page_col, info_col = st.columns([1, 1, 4])
+    with size_col:
+        page_size = st.selectbox("Rows per page", [50, 100, 250, 500, 1000], index=1)
+    pages = max((len(order) + page_size - 1) // page_size, 1)
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+    start = (min(page, pages) - 1) * page_size
+    with info_col:
+        st.caption(f"Showing rows {min(start + 1, len(order)):,}–{min(start + page_size, len(order)):,} "
+                   f"of {len(order):,} (page {min(page, pages)} of {pages:,})")
+    
+    # Timestamps are formatted by the grid at render time only. Pooled columns go out as
+    # plain text: Arrow would otherwise ship each column's whole category pool with the page
+    page_rows = view.take(order[start:start + page_size]).astype({column: TEXT_DTYPE for column in CATEGORICAL_COLUMNS})
+    st.dataframe(page_rows, hide_index=True, column_config={
+        'Asked at': st.column_config.DatetimeColumn(format="MMMM DD, YYYY HH:mm:ss")
+    })
+    
+    # Download button and statistics
+    export_download_button(f"Download as {export_format}", data_key, 'conversation_details', view,
+                           export_format, date_format=DISPLAY_DATE_FORMAT)
+    
+    render_quick_statistics(cached_quick_statistics(data_key, backend, approximate, days, view, cube), cube, approximate)
+    
+    with st.expander("🧮 Memory Usage"):
+        # The shared frame behind every view and day range of this data version
+        memory_report = cached_memory_report(data_key, view.df)
+        st.caption(f"{memory_report['Bytes'].sum() / 1024 ** 2:,.1f} MB resident for {len(view.df):,} rows")
+        st.dataframe(memory_report, hide_index=True, use_container_width=True)
+
+def render_quick_statistics(stats, cube, approximate):
+    st.subheader("⚡ Quick Statistics")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("💬 Total Conversations", stats['conversations'])
+    with col2:
+        st.metric("🌍 Unique Countries", stats['countries'])
+    with col3:
+        st.metric("⭐ Average Response Score", f"{stats['score']:.2f}")
+    with col4:
+        if not approximate:
+            st.metric("👥 Unique Users", f"{stats['users']:,}")
+        else:
+            st.metric("👥 Unique Users", f"≈{stats['users']:,}",
+                      f"±{cube.relative_error:.1%}", delta_color="off")
+
+@st.fragment
+def render_spilled_data_view(data_key, spilled, approximate, export_format):
+    # Out-of-core rows are paged straight from the files of the selected day partitions,
+    # oldest day first and in export order within a day
+    size_col, page_col, info_col = st.columns([1, 1, 4])
+    with size_col:
+        page_size = st.selectbox("Rows per page", [50, 100, 250, 500, 1000], index=1)
+    total = len(spilled)
+    pages = max((total + page_size - 1) // page_size, 1)
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+    start = (min(page, pages) - 1) * page_size
+    with info_col:
+        st.caption(f"Showing rows {min(start + 1, total):,}–{min(start + page_size, total):,} "
+                   f"of {total:,} (page {min(page, pages)} of {pages:,}); sorting and filters "
+                   f"are not available out of core")
+    
+    st.dataframe(spilled.read_rows(start, start + page_size), hide_index=True, column_config={
+        'Asked at': st.column_config.DatetimeColumn(format="MMMM DD, YYYY HH:mm:ss")
+    })
+    
+    # Exported from the plain spilled columns: per-batch category pools cannot share one IPC dictionary
+    export_download_button(f"Download as {export_format}", data_key, 'conversation_details', spilled.rows,
+                           export_format, date_format=DISPLAY_DATE_FORMAT)
+    
+    stats = cached_cube_statistics(data_key, approximate, spilled.days, spilled.cube)
+    render_quick_statistics(stats, spilled.cube, approximate)
+    selected, stored = spilled.rows.partition_count()
+    st.caption(f"Reading {selected:,} of {stored:,} day partitions spilled to {spilled.path}")
+
+@st.fragment
+def render_daily_analytics(data_key, cube, backend, approximate, days, export_format):
+    st.subheader("📊 Daily Usage Analytics")
+    
+    # Get daily metrics
+    daily_metrics = cached_daily_metrics(data_key, backend, approximate, days, cube)
+    daily_metrics = daily_metrics.sort_values('Date')
+    
+    # Display metrics as a line chart
+    st.line_chart(daily_metrics.set_index('Date')[['Questions', 'Users']])
+    
+    # Display metrics as a table
+    st.subheader("📅 Daily Breakdown")
+    if approximate:
+        st.caption(f"Users are HyperLogLog estimates (±{cube.relative_error:.1%} standard error)")
+    st.dataframe(daily_metrics.sort_values('Date', ascending=False))
+    
+    # Download daily metrics
+    export_download_button("Download Daily Metrics", f"{data_key}-{backend}-{approximate}", 'daily_metrics',
+                           daily_metrics, export_format)
+
+@st.fragment
+def render_country_analytics(data_key, cube, backend, approximate, days, export_format):
+    st.subheader("🌎 Country Usage Analytics")
+    
+    # Country metrics over the selected date range (all days when days is None)
+    country_metrics = cached_country_metrics(data_key, backend, approximate, days, cube)
+    
+    # Top countries metrics
+    st.subheader("🏆 Top Countries Overview")
+    top_metrics_col1, top_metrics_col2, top_metrics_col3 = st.columns(3)
+    
+    if country_metrics.empty:
+        st.info("No questions in the selected date range")
+        return
+    
+    with top_metrics_col1:
+        top_country = country_metrics.iloc[0]
+        st.metric("Most Active Country", 
+                 f"{top_country['Country']}", 
+                 f"{top_country['Questions']} questions")
+    
+    with top_metrics_col2:
+        total_questions = country_metrics['Questions'].sum()
+        st.metric("Total Questions", 
+                 f"{total_questions:,}", 
+                 f"Across {len(country_metrics)} countries")
+    
+    with top_metrics_col3:
+        avg_questions = country_metrics['Questions'].mean()
+        st.metric("Average Questions per Country", 
+                 f"{avg_questions:.1f}")
+    
+    # Detailed country breakdown
+    st.subheader("🌍 Country Breakdown")
+    if approximate:
+        st.caption(f"Users are HyperLogLog estimates (±{cube.relative_error:.1%} standard error)")
+    st.dataframe(
+        country_metrics,
+        use_container_width=True
+    )
+    
+    # Download option
+    export_download_button("📥 Download Country Metrics", f"{data_key}-{backend}-{approximate}", 'country_metrics',
+                           country_metrics, export_format)
+
+@st.fragment
+def render_category_analysis(data_key, df, rules_path, parallel, backend, export_format):
+    st.subheader("🔍 Question Category Analysis")
+    
+    # Fix the button and analysis logic
+    if st.button("🔄 Analyze Question Categories"):
+        try:
+            # Remove the model parameter
+            rules = load_category_rules(rules_path)
+            if hasattr(df, 'cube'):
+                # Out-of-core rows: the labels are spilled next to the rows instead of kept in memory
+                category_metrics, question_details = categorize_spilled(df, rules, parallel=parallel, backend=backend)
+            else:
+                # The view's rows are copied out for the analysis only
+                df_with_categories = categorize_questions(df.take(), rules, parallel=parallel, backend=backend)
+                category_metrics = get_category_metrics(build_analytics(df_with_categories, backend))
+                question_details = df_with_categories[['User Question', 'Category']].copy()
+                question_details.index = range(1, len(question_details) + 1)  # Add serial numbers
+                question_details.index.name = 'S.No'
+            
+            # Save results in session state
+            st.session_state.category_metrics = category_metrics
+            st.session_state.question_details = question_details
+            st.session_state.category_version = f"{data_key}-{rules.version}"
+            st.session_state.category_analysis_done = True
+            
+        except Exception as e:
+            st.error(f"Error in category analysis: {str(e)}")
+    
+    # Show results if analysis is done
+    if st.session_state.get('category_analysis_done', False):
+        # Display category distribution
+        fig = px.pie(st.session_state.category_metrics, 
+                   values='Count',  # Use Count for correct proportions
+                   names='Category',
+                   title='Question Category Distribution',
+                   hole=0.4,
+                   color_discrete_sequence=px.colors.qualitative.Set3)
+        
+        # Update traces with percentage values from the table
+        fig.update_traces(
+            textposition='outside',
+            textinfo='label+text',  # Show label and custom text
+            text=st.session_state.category_metrics['Percentage'],  # Use percentage from table
+            hovertemplate="<b>%{label}</b><br>Count: %{value}<br>Percentage: %{text}",
+            texttemplate='%{label}<br>%{text}'  # Show both label and percentage
+        )
+        
+        # Update layout
+        fig.update_layout(
+            showlegend=True,
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=-0.2,
+                xanchor="center",
+                x=0.5
+            ),
+            margin=dict(t=60, b=100)
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Display metrics table
+        st.subheader("📊 Category Breakdown")
+        st.dataframe(st.session_state.category_metrics)
+        
+        # Display detailed question breakdown
+        st.subheader("📝 Question Details")
+        question_details = st.session_state.question_details
+        spilled = hasattr(question_details, 'read_rows')
+        if spilled:
+            total = len(question_details)
+            st.caption(f"First {min(QUESTION_PREVIEW_ROWS, total):,} of {total:,} questions; "
+                       f"the download has all of them")
+            st.dataframe(question_details.read_rows(0, QUESTION_PREVIEW_ROWS), hide_index=True,
+                         use_container_width=True)
+        else:
+            st.dataframe(question_details.reset_index(), use_container_width=True)
+        
+        # Download options
+        col1, col2 = st.columns(2)
+        with col1:
+            export_download_button("📥 Download Category Summary", st.session_state.category_version,
+                                   'category_summary', st.session_state.category_metrics, export_format)
+        
+        with col2:
+            export_download_button("📥 Download Question Details", st.session_state.category_version,
+                                   'question_details', question_details, export_format, index=not spilled)
+
+def select_date_range(cube):
+    # Date range picker bounded by the days in the cube; returns inclusive day keys, or
+    # None when the whole history is selected
+    day_keys = cube.cells['day']
+    if day_keys.empty:
+        return None
+    first, last = (np.datetime64(int(day), 'D').astype(object) for day in (day_keys.min(), day_keys.max()))
+    selected = st.date_input("📅 Date range", value=(first, last), min_value=first, max_value=last)
+    if len(selected) != 2 or tuple(selected) == (first, last):
+        return None  # a range still being picked counts as the whole history
+    return tuple(int(np.datetime64(day, 'D').astype(np.int64)) for day in selected)
 
 def main():
     st.title("📊 Chatbase Conversations Analyzer")
@@ -142,196 +1777,110 @@ def main():
     
     uploaded_file = st.file_uploader("Choose a JSON file", type="json")
     
-    # Fix the file upload check condition
+    st.sidebar.header("⚙️ Settings")
+    parallel_categories = st.sidebar.toggle(
+        "Parallel category analysis",
+        help=f"Classify questions across {CATEGORY_WORKERS} worker processes"
+    )
+    rules_path = st.sidebar.text_input(
+        "Category rules file",
+        value=CATEGORY_RULES_PATH,
+        help="JSON or YAML file defining brands, intents and keyword lists"
+    )
+    approximate = st.sidebar.toggle(
+        "Approximate distinct counts",
+        help="Count distinct users with mergeable HyperLogLog sketches instead of exact scans"
+    )
+    incremental = st.sidebar.toggle(
+        "Incremental ingestion",
+        disabled=pa is None,
+        help=f"Merge uploads into the local store at {STORE_DIR}, processing only new or changed conversations"
+    )
+    out_of_core = st.sidebar.toggle(
+        "Out-of-core processing",
+        disabled=pa is None or incremental,
+        help=f"Spill processed rows to {SPILL_DIR} in batches of {budget_batch_size():,} rows "
+             f"({MEMORY_BUDGET_MB} MB budget) and merge the metrics from per-batch aggregates"
+    )
+    out_of_core = out_of_core and not incremental  # the store keeps its rows in memory
+    if out_of_core and not approximate:
+        # Exact distinct users would need every visitor id in memory at once
+        st.sidebar.caption("Out-of-core processing counts distinct users with HyperLogLog sketches")
+        approximate = True
+    backend = st.sidebar.selectbox(
+        "Analytics backend",
+        ANALYTICS_BACKENDS,
+        help=f"Engine computing the metrics; DuckDB runs them as SQL and spills to {DUCKDB_TEMP_DIR} "
+             f"beyond {DUCKDB_MEMORY_LIMIT}, Polars runs them (and category tagging) as lazy queries"
+    )
+    if out_of_core and backend == 'Polars':
+        # Polars would collect the spilled rows in memory; it still tags each batch's categories
+        st.sidebar.caption("Out-of-core metrics come from the per-batch cube; Polars tags the categories")
+    elif out_of_core and backend == 'DuckDB':
+        st.sidebar.caption("DuckDB queries the spilled Parquet files directly")
+    export_format = st.sidebar.selectbox(
+        "Download format",
+        [name for name in EXPORT_FORMATS if pa is not None or name.startswith('CSV')],
+        help="Format used by every download button"
+    )
+    
+    # Reset the analysis whenever the uploaded content changes
+    file_hash = get_file_hash(uploaded_file) if uploaded_file is not None else None
     if (uploaded_file is not None and 
-        ('previous_file' not in st.session_state or 
-         st.session_state.get('previous_file') != getattr(uploaded_file, 'name', None))):
+        st.session_state.get('previous_file') != file_hash):
         st.session_state.category_analysis_done = False
-        st.session_state.previous_file = uploaded_file.name
+        st.session_state.previous_file = file_hash
     
     if uploaded_file is not None:
         try:
-            data = json.load(uploaded_file)
-            df = process_conversations(data)
+            if incremental:
+                store = get_conversation_store()
+                if file_hash not in store.meta['ingested']:
+                    with st.spinner('Merging new and changed conversations into the local store...'):
+                        added, replaced = store.ingest(uploaded_file, file_hash)
+                    st.info(f"Ingested {added} new and {replaced} changed conversations")
+                st.caption(f"Showing {len(store.versions):,} conversations from {len(store.meta['ingested'])} exports in the local store")
+                df = store.rows.copy(deep=False)
+                data_key = f"store-{len(store.meta['ingested'])}-{store.meta['ingested'][-1]}"
+                # The store maintains the sketch cube; exact counts build members from its rows
+                cube = store.cube if approximate else get_rollup_cube(data_key, True, df)
+            elif out_of_core:
+                # Rows stay on disk; the metrics come from the cube merged while spilling
+                with st.spinner('Processing the export in batches...'):
+                    df = load_spilled_conversations(uploaded_file, file_hash)
+                cube = df.cube
+                data_key = f"spill-{file_hash}"
+            else:
+                df = load_conversations(uploaded_file, file_hash)
+                cube = get_rollup_cube(file_hash, not approximate, df)
+                data_key = file_hash
+            days = select_date_range(cube)
+            if backend == 'DuckDB' or (backend != 'pandas' and not out_of_core):
+                cube = get_backend_analytics(data_key, backend, df)
             
             # Create tabs
             tab1, tab2, tab3, tab4 = st.tabs(["📋 Full Data View", "📈 Daily Analytics", "🌎 Country Analytics", "🔍 Categorical Analysis"])
             
-            with tab1:
-                # Original content
-                df['Asked at'] = pd.to_datetime(df['Asked at'])  # Changed from 'Created At'
-                df = df.sort_values('Asked at', ascending=False)  # Changed from 'Created At'
-                df['Asked at'] = df['Asked at'].dt.strftime("%B %d, %Y %H:%M:%S")  # Changed from 'Created At'
-                df['S.No'] = range(1, len(df) + 1)
-                
-                st.dataframe(df)
-                
-                # Download button and statistics
-                csv = df.to_csv(index=False)
-                current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-                st.download_button(
-                    label="Download as CSV",
-                    data=csv,
-                    file_name=f'conversation_details_{current_time}.csv',
-                    mime='text/csv',
-                )
-                
-                st.subheader("⚡ Quick Statistics")
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("💬 Total Conversations", len(df))
-                with col2:
-                    st.metric("🌍 Unique Countries", len(df['Country'].unique()))
-                with col3:
-                    st.metric("⭐ Average Response Score", f"{df['Score'].mean():.2f}")
-            
+            # Each tab is a fragment: interacting with one reruns only that tab, and its
+            # inputs are memoized per data version and date range so full reruns stay cheap
+            view_key = range_key(data_key, days)
+            if st.session_state.get('previous_view') != view_key:
+                st.session_state.category_analysis_done = False  # categories were for other rows
+                st.session_state.previous_view = view_key
+            if out_of_core:
+                view = df.select(days)
+                with tab1:
+                    render_spilled_data_view(view_key, view, approximate, export_format)
+            else:
+                view = DataView(df, get_date_range_order(data_key, days, df, get_view_order(data_key, df)))
+                with tab1:
+                    render_data_view(view_key, view, cube, cube.backend, approximate, days, export_format)
             with tab2:
-                st.subheader("📊 Daily Usage Analytics")
-                
-                # Get daily metrics
-                daily_metrics = get_daily_metrics(df)
-                daily_metrics = daily_metrics.sort_values('Date')
-                
-                # Display metrics as a line chart
-                st.line_chart(daily_metrics.set_index('Date'))
-                
-                # Display metrics as a table
-                st.subheader("📅 Daily Breakdown")
-                st.dataframe(daily_metrics.sort_values('Date', ascending=False))
-                
-                # Download daily metrics
-                csv_metrics = daily_metrics.to_csv(index=False)
-                st.download_button(
-                    label="Download Daily Metrics",
-                    data=csv_metrics,
-                    file_name=f'daily_metrics_{current_time}.csv',
-                    mime='text/csv',
-                )
-            
+                render_daily_analytics(view_key, cube, cube.backend, approximate, days, export_format)
             with tab3:
-                st.subheader("🌎 Country Usage Analytics")
-                
-                # Get country metrics without date filtering
-                country_metrics = get_country_metrics(df)
-                
-                # Top countries metrics
-                st.subheader("🏆 Top Countries Overview")
-                top_metrics_col1, top_metrics_col2, top_metrics_col3 = st.columns(3)
-                
-                with top_metrics_col1:
-                    top_country = country_metrics.iloc[0]
-                    st.metric("Most Active Country", 
-                             f"{top_country['Country']}", 
-                             f"{top_country['Questions']} questions")
-                
-                with top_metrics_col2:
-                    total_questions = country_metrics['Questions'].sum()
-                    st.metric("Total Questions", 
-                             f"{total_questions:,}", 
-                             f"Across {len(country_metrics)} countries")
-                
-                with top_metrics_col3:
-                    avg_questions = country_metrics['Questions'].mean()
-                    st.metric("Average Questions per Country", 
-                             f"{avg_questions:.1f}")
-                
-                # Detailed country breakdown
-                st.subheader("🌍 Country Breakdown")
-                st.dataframe(
-                    country_metrics,
-                    use_container_width=True
-                )
-                
-                # Download option
-                csv_metrics = country_metrics.to_csv(index=False)
-                st.download_button(
-                    label="📥 Download Country Metrics",
-                    data=csv_metrics,
-                    file_name=f'country_metrics_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                    mime='text/csv',
-                )
-            
+                render_country_analytics(view_key, cube, cube.backend, approximate, days, export_format)
             with tab4:
-                st.subheader("🔍 Question Category Analysis")
-                
-                # Fix the button and analysis logic
-                if st.button("🔄 Analyze Question Categories"):
-                    try:
-                        # Remove the model parameter
-                        category_metrics, df_with_categories = get_category_metrics(df)
-                        
-                        # Save results in session state
-                        st.session_state.category_metrics = category_metrics
-                        st.session_state.df_with_categories = df_with_categories
-                        st.session_state.category_analysis_done = True
-                        
-                    except Exception as e:
-                        st.error(f"Error in category analysis: {str(e)}")
-                
-                # Show results if analysis is done
-                if st.session_state.get('category_analysis_done', False):
-                    # Display category distribution
-                    fig = px.pie(st.session_state.category_metrics, 
-                               values='Count',  # Use Count for correct proportions
-                               names='Category',
-                               title='Question Category Distribution',
-                               hole=0.4,
-                               color_discrete_sequence=px.colors.qualitative.Set3)
-                    
-                    # Update traces with percentage values from the table
-                    fig.update_traces(
-                        textposition='outside',
-                        textinfo='label+text',  # Show label and custom text
-                        text=st.session_state.category_metrics['Percentage'],  # Use percentage from table
-                        hovertemplate="<b>%{label}</b><br>Count: %{value}<br>Percentage: %{text}",
-                        texttemplate='%{label}<br>%{text}'  # Show both label and percentage
-                    )
-                    
-                    # Update layout
-                    fig.update_layout(
-                        showlegend=True,
-                        legend=dict(
-                            orientation="h",
-                            yanchor="bottom",
-                            y=-0.2,
-                            xanchor="center",
-                            x=0.5
-                        ),
-                        margin=dict(t=60, b=100)
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # Display metrics table
-                    st.subheader("📊 Category Breakdown")
-                    st.dataframe(st.session_state.category_metrics)
-                    
-                    # Display detailed question breakdown
-                    st.subheader("📝 Question Details")
-                    question_details = st.session_state.df_with_categories[['User Question', 'Category']].copy()
-                    question_details.index = range(1, len(question_details) + 1)  # Add serial numbers
-                    question_details.index.name = 'S.No'
-                    st.dataframe(question_details.reset_index(), use_container_width=True)
-                    
-                    # Download options
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        csv_categories = st.session_state.category_metrics.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download Category Summary",
-                            data=csv_categories,
-                            file_name=f'category_summary_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                            mime='text/csv',
-                        )
-                    
-                    with col2:
-                        csv_details = question_details.to_csv()
-                        st.download_button(
-                            label="📥 Download Question Details",
-                            data=csv_details,
-                            file_name=f'question_details_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                            mime='text/csv',
-                        )
+                render_category_analysis(view_key, view, rules_path, parallel_categories, backend, export_format)
                 
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
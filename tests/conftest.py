@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# app.py is a flat Streamlit script at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from synthetic import make_export  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def rows():
+    return app.process_conversations(make_export(3000, 30))
+
+
+@pytest.fixture
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'SPILL_DIR', str(tmp_path))
+    return tmp_path
@@ -0,0 +1,82 @@
+# Synthetic exports and from-scratch reference metrics shared by the tests
+import io
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+import app
+
+QUESTIONS = ["What is Atlan?", "how to connect snowflake", "Explain lineage", "hello", "Atlan pricing", None]
+
+
+def make_export(conversations, days, seed=0, first_id=0):
+    # Synthetic Chatbase export: 1-3 questions per conversation, spread over `days` days
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    export = []
+    for i in range(first_id, first_id + conversations):
+        messages = []
+        for _ in range(rng.randint(1, 3)):
+            messages.append({"role": "user", "type": "text", "content": rng.choice(QUESTIONS)})
+            answer = {"role": "assistant", "type": "text", "content": "Sure!"}
+            if rng.random() < 0.8:
+                answer["score"] = round(rng.random(), 3)
+            messages.append(answer)
+        asked_at = base + timedelta(days=i % days if conversations >= days else rng.randrange(days),
+                                    seconds=rng.randrange(86400))
+        export.append({
+            "id": f"conv-{i}",
+            "created_at": asked_at.isoformat(),
+            "country": rng.choice(["US", "IN", "DE", "Unknown"]),
+            "customer": f"cust-{rng.randrange(max(conversations // 3, 1))}",
+            "messages": messages,
+        })
+    return {"conversations": export}
+
+
+def reference_daily_metrics(df, days=None):
+    # From-scratch pandas groupby over the processed rows
+    day = pd.Series(app.get_day_keys(df), index=df.index)
+    if days is not None:
+        df, day = df[day.between(*days)], day[day.between(*days)]
+    grouped = df.assign(Score=df['Score'].to_numpy(dtype=np.float64, na_value=np.nan)).groupby(day)
+    metrics = pd.DataFrame({
+        'Questions': grouped['User Question'].count(),
+        'Users': grouped['Visitor'].nunique(),
+        'Conversations': grouped['Conversation'].nunique(),
+        'Avg Score': grouped['Score'].mean(),
+    })
+    metrics.insert(0, 'Date', pd.to_datetime(metrics.index, unit='D').date)
+    return metrics.reset_index(drop=True)
+
+
+def reference_country_metrics(df):
+    grouped = df.groupby(df['Country'].astype(str))
+    return pd.DataFrame({
+        'Questions': grouped['User Question'].count(),
+        'Users': grouped['Visitor'].nunique(),
+    }).sort_index()
+
+
+def country_table(metrics):
+    return metrics.set_index(metrics['Country'].astype(str))[['Questions', 'Users']].sort_index()
+
+
+def assert_daily_equal(actual, expected):
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False)
+
+
+def spill(export, name='export'):
+    return app.load_spilled_conversations(io.BytesIO(json.dumps(export).encode()), name)
+
+
+def assert_sketch_daily_equal(spilled_cube, df, days=None):
+    # Registers merged across batches equal the registers of the whole frame, so even the
+    # estimates match; the other columns are exact
+    expected = app.get_daily_metrics(app.RollupCube.from_frame(df), True, days)
+    assert_daily_equal(app.get_daily_metrics(spilled_cube, True, days), expected)
+    reference = reference_daily_metrics(df, days)
+    assert_daily_equal(expected.drop(columns='Users'), reference.drop(columns='Users'))
@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+import app
+from synthetic import (assert_daily_equal, country_table, make_export, reference_country_metrics,
+                       reference_daily_metrics, spill)
+
+
+def assert_matches_reference(analytics, rows):
+    assert_daily_equal(app.get_daily_metrics(analytics), reference_daily_metrics(rows))
+    first = int(app.get_day_keys(rows).min())
+    days = (first + 5, first + 12)
+    assert_daily_equal(app.get_daily_metrics(analytics, days=days), reference_daily_metrics(rows, days))
+    pd.testing.assert_frame_equal(country_table(app.get_country_metrics(analytics)), reference_country_metrics(rows),
+                                  check_dtype=False)
+
+
+@pytest.mark.skipif(app.duckdb is None or app.pa is None, reason="DuckDB is not installed")
+def test_duckdb_matches_reference(rows):
+    assert_matches_reference(app.build_analytics(rows, 'DuckDB'), rows)
+
+
+@pytest.mark.skipif(app.duckdb is None or app.pa is None, reason="DuckDB is not installed")
+def test_duckdb_reads_spilled_rows(spill_dir):
+    export = make_export(3000, 30, seed=10)
+    assert_matches_reference(app.build_analytics(spill(export), 'DuckDB'), app.process_conversations(export))
+
+
+@pytest.mark.skipif(app.pl is None or app.pa is None, reason="Polars is not installed")
+def test_polars_matches_reference(rows):
+    assert_matches_reference(app.build_analytics(rows, 'Polars'), rows)
@@ -0,0 +1,120 @@
+import itertools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+import app
+
+
+def original_category(question):
+    # analyze_question_category as it was before the category engine was compiled
+    question = question.lower()
+    if "atlan" in question:
+        if any(word in question for word in ["what is", "what's", "define", "explain", "describe"]):
+            return "What is / Define (Branded)"
+        elif any(word in question for word in ["how to", "how do", "guide", "steps", "process"]):
+            return "FAQ / How to (Branded)"
+        return "Branded"
+    if any(word in question for word in ["what is", "what's", "define", "explain", "describe"]):
+        return "What is / Define (Non branded)"
+    elif any(word in question for word in ["how to", "how do", "guide", "steps", "process"]):
+        return "FAQ / How to Type (Non branded)"
+    return "Others"
+
+
+def sample_questions():
+    # Every combination of fragments, including overlapping and prefix-sharing keywords
+    fragments = ["What is", "WHAT'S", "atlan", "Atlan's", "how to", "How do I", "guide", "processes",
+                 "explained", "describe", "definitely", "step", "database", "data", "hello"]
+    questions = [" ".join(words) for size in (1, 2, 3) for words in itertools.permutations(fragments, size)]
+    return questions + ["whatis", "how  to", "", "atlanwhat is", "procesS"]
+
+
+def test_classification_matches_the_original_rules():
+    rules = app.load_category_rules()
+    questions = sample_questions()
+    expected = [original_category(question) for question in questions]
+    assert list(app.classify_questions(pd.Series(questions, dtype=app.TEXT_DTYPE), rules)) == expected
+
+
+@pytest.mark.skipif(app.pl is None, reason="Polars is not installed")
+def test_polars_classification_matches_the_original_rules():
+    rules = app.load_category_rules()
+    questions = sample_questions() + [None]
+    expected = [original_category(question or "") for question in questions]
+    assert list(app.classify_questions_polars(pd.Series(questions, dtype=app.TEXT_DTYPE), rules)) == expected
+
+
+def test_missing_questions_are_others():
+    rules = app.load_category_rules()
+    labels = app.classify_questions(pd.Series(["What is Atlan?", None], dtype=app.TEXT_DTYPE), rules)
+    assert list(labels) == ["What is / Define (Branded)", "Others"]
+
+
+def test_categorize_questions_labels_every_row():
+    rules = app.load_category_rules()
+    questions = sample_questions()
+    df = pd.DataFrame({'User Question': pd.Series(questions * 2, dtype=app.TEXT_DTYPE)})
+    categorized = app.categorize_questions(df, rules)
+    assert np.array_equal(categorized['Category'].astype(str), [original_category(q) for q in questions * 2])
+
+
+def test_memo_evicts_least_recently_used_entries():
+    memo = app.CategoryMemo(3)
+    memo.put_many('v1', np.array([1, 2, 3], dtype=np.uint64), ['a', 'b', 'c'])
+    assert list(memo.get_many('v1', np.array([3, 1, 9], dtype=np.uint64))) == ['c', 'a', None]
+    memo.put_many('v1', np.array([4], dtype=np.uint64), ['d'])  # 2 was used least recently
+    assert list(memo.get_many('v1', np.array([1, 2, 3, 4], dtype=np.uint64))) == ['a', None, 'c', 'd']
+    # Rule-set versions never share entries
+    assert list(memo.get_many('v2', np.array([1], dtype=np.uint64))) == [None]
+
+
+def test_memoized_questions_are_not_classified_again(monkeypatch):
+    monkeypatch.setattr(app, 'get_category_memo', lambda memo=app.CategoryMemo(100): memo)
+    rules = app.load_category_rules()
+    df = pd.DataFrame({'User Question': pd.Series(["What is Atlan?", "hello", "WHAT IS ATLAN? "], dtype=app.TEXT_DTYPE)})
+    first = app.categorize_questions(df.copy(), rules)['Category'].astype(str).tolist()
+    
+    classified = []
+    analyze = app.analyze_batch_questions
+    
+    def record(questions, rules):
+        classified.extend(questions)
+        yield from analyze(questions, rules)
+    
+    monkeypatch.setattr(app, 'analyze_batch_questions', record)
+    assert app.categorize_questions(df.copy(), rules)['Category'].astype(str).tolist() == first
+    assert classified == []
+    assert first == ["What is / Define (Branded)", "Others", "What is / Define (Branded)"]
+
+
+def test_rule_files_in_json_and_yaml(tmp_path):
+    config = {
+        "brands": ["Acme"],
+        "intents": [{"keywords": ["price", "cost"], "branded": "Pricing (Branded)", "non_branded": "Pricing"}],
+        "fallback": "Other",
+    }
+    json_path = tmp_path / "rules.json"
+    json_path.write_text(json.dumps(config))
+    yaml_path = tmp_path / "rules.yaml"
+    yaml_path.write_text(yaml.safe_dump(config))
+    questions = pd.Series(["What does ACME cost?", "price list", "acme", "hi"], dtype=app.TEXT_DTYPE)
+    expected = ["Pricing (Branded)", "Pricing", "Branded", "Other"]
+    for path in (json_path, yaml_path):
+        assert list(app.classify_questions(questions, app.load_category_rules(str(path)))) == expected
+
+
+def test_editing_the_rule_file_recompiles_it(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"brands": ["acme"], "intents": []}))
+    first = app.load_category_rules(str(path))
+    assert app.load_category_rules(str(path)) is first
+    path.write_text(json.dumps({"brands": ["globex"], "intents": []}))
+    os.utime(path, ns=(1, 1))
+    second = app.load_category_rules(str(path))
+    assert second.version != first.version
+    assert list(app.classify_questions(pd.Series(["globex"], dtype=app.TEXT_DTYPE), second)) == ["Branded"]
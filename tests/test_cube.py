@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+import app
+from synthetic import assert_daily_equal, country_table, reference_country_metrics, reference_daily_metrics
+
+
+def test_cube_matches_reference(rows):
+    cube = app.RollupCube.from_frame(rows, exact=True)
+    assert_daily_equal(app.get_daily_metrics(cube), reference_daily_metrics(rows))
+    pd.testing.assert_frame_equal(country_table(app.get_country_metrics(cube)), reference_country_metrics(rows),
+                                  check_dtype=False)
+
+
+def test_sparse_sketch_matches_dense_registers(rows):
+    cube = app.RollupCube.from_frame(rows)
+    precision = cube.precision
+    suffix_bits = 64 - precision
+    hashes = app.hash_categorical(rows['Visitor'])
+    registers = np.zeros(1 << precision, dtype=np.int64)
+    for value in hashes.tolist():
+        suffix = value & ((1 << suffix_bits) - 1)
+        index = value >> suffix_bits
+        registers[index] = max(registers[index], suffix_bits + 1 - suffix.bit_length())
+    zeros = int((registers == 0).sum())
+    dense = app.hll_estimate(np.exp2(-registers.astype(np.float64)).sum(), zeros, precision)
+    assert cube.distinct_users(approximate=True) == int(np.round(dense))
+    exact = rows['Visitor'].nunique()
+    assert abs(cube.distinct_users(approximate=True) - exact) <= 0.1 * exact
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pytest
+
+import app
+
+
+def test_csv_is_written_in_chunks(rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_CHUNK_ROWS', 1000)
+    path = str(tmp_path / "rows.csv")
+    app.write_export(rows, path, 'CSV')
+    assert open(path, encoding='utf-8').read() == rows.to_csv(index=False)
+
+
+def test_lazy_export_writes_once_and_reuses_the_file(rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_DIR', str(tmp_path))
+    writes = []
+    write_export = app.write_export
+    monkeypatch.setattr(app, 'write_export', lambda *args, **kwargs: writes.append(1) or write_export(*args, **kwargs))
+    export = app.lazy_export('v1', 'rows', rows, 'CSV')
+    assert writes == []  # nothing is written until the download is clicked
+    data = export()
+    assert data == export() == rows.to_csv(index=False).encode()
+    assert writes == [1]
+    assert os.listdir(tmp_path) == ['rows_v1.csv']
+
+
+def test_exports_are_pruned_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'EXPORT_MAX_FILES', 2)
+    df = pd.DataFrame({'a': [1, 2]})
+    for i, version in enumerate(['a', 'b']):
+        app.lazy_export(version, 'rows', df, 'CSV')()
+        os.utime(tmp_path / f"rows_{version}.csv", ns=(i, i))
+    app.lazy_export('a', 'rows', df, 'CSV')()  # a is now more recent than b
+    app.lazy_export('c', 'rows', df, 'CSV')()
+    assert sorted(os.listdir(tmp_path)) == ['rows_a.csv', 'rows_c.csv']
+
+
+def read_export(path, export_format):
+    if export_format == 'CSV (gzip)':
+        return pd.read_csv(path, compression='gzip')
+    if export_format == 'Parquet (zstd)':
+        return app.pa.parquet.read_table(path).to_pandas()
+    return app.pa.ipc.open_file(path).read_all().to_pandas()
+
+
+@pytest.mark.skipif(app.pa is None, reason="pyarrow is not installed")
+@pytest.mark.parametrize('export_format', ['CSV (gzip)', 'Parquet (zstd)', 'Arrow IPC'])
+def test_export_formats_round_trip(rows, tmp_path, monkeypatch, export_format):
+    monkeypatch.setattr(app, 'EXPORT_CHUNK_ROWS', 1000)
+    path = str(tmp_path / f"rows{app.EXPORT_FORMATS[export_format][0]}")
+    app.write_export(rows, path, export_format)
+    exported = read_export(path, export_format)
+    assert len(exported) == len(rows)
+    assert exported['User Question'].fillna('').tolist() == rows['User Question'].fillna('').tolist()
+    assert exported['Country'].fillna('').tolist() == rows['Country'].astype(object).fillna('').tolist()
+    if export_format != 'CSV (gzip)':
+        # Columnar files keep the typed columns, including the timezone
+        pd.testing.assert_series_equal(exported['Asked at'], rows['Asked at'], check_names=False)
+        pd.testing.assert_series_equal(exported['Score'], rows['Score'], check_names=False)
+
+
+@pytest.mark.skipif(app.pa is None, reason="pyarrow is not installed")
+def test_columnar_exports_write_one_row_group_per_chunk(rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_CHUNK_ROWS', 1000)
+    path = str(tmp_path / "rows.parquet")
+    app.write_export(rows, path, 'Parquet (zstd)')
+    metadata = app.pa.parquet.ParquetFile(path).metadata
+    assert metadata.num_row_groups == -(-len(rows) // 1000)
+    assert metadata.row_group(0).column(0).compression == 'ZSTD'
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+import app
+
+
+def test_bit_length_is_exact():
+    values = np.array([0, 1, 2, 3, (1 << 53) - 1, 1 << 53, (1 << 53) + 1, (1 << 64) - 1], dtype=np.uint64)
+    values = np.concatenate([values, np.random.default_rng(0).integers(0, 1 << 63, 1000, dtype=np.uint64)])
+    assert app.bit_length(values).tolist() == [int(value).bit_length() for value in values]
+
+
+@pytest.mark.parametrize('cardinality', [10, 1000, 200000])
+def test_estimates_stay_within_the_error_bound(cardinality):
+    precision = app.HLL_PRECISION
+    suffix_bits = 64 - precision
+    hashes = np.random.default_rng(cardinality).integers(0, np.iinfo(np.uint64).max, cardinality, dtype=np.uint64,
+                                                          endpoint=True)
+    registers = np.zeros(1 << precision, dtype=np.int64)
+    ranks = suffix_bits + 1 - app.bit_length(hashes & np.uint64((1 << suffix_bits) - 1)).astype(np.int64)
+    np.maximum.at(registers, (hashes >> np.uint64(suffix_bits)).astype(np.int64), ranks)
+    estimate = app.hll_estimate(np.exp2(-registers.astype(np.float64)).sum(), int((registers == 0).sum()), precision)
+    assert abs(estimate - cardinality) <= 3 * 1.04 / np.sqrt(1 << precision) * cardinality
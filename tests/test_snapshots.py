@@ -0,0 +1,32 @@
+import os
+
+import app
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'SNAPSHOT_DIR', str(tmp_path))
+    df = app.process_conversations({"conversations": [{
+        "id": "c1", "created_at": "2024-01-01T10:00:00Z", "country": "US",
+        "messages": [{"role": "user", "content": "What is Atlan?"},
+                     {"role": "assistant", "type": "text", "content": "A catalog", "score": 0.5}],
+    }]})
+    app.write_snapshot(df, 'a')
+    loaded = app.read_snapshot('a')
+    assert loaded['User Question'].tolist() == ["What is Atlan?"]
+    assert loaded['Asked at'].dt.tz is not None
+    assert app.read_snapshot('missing') is None
+
+
+def test_snapshots_are_pruned_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'SNAPSHOT_MAX_FILES', 2)
+    df = app.process_conversations({"conversations": [{
+        "id": "c1", "created_at": "2024-01-01T10:00:00Z", "country": "US",
+        "messages": [{"role": "user", "content": "hello"}],
+    }]})
+    for i, name in enumerate(['a', 'b']):
+        app.write_snapshot(df, name)
+        os.utime(app.snapshot_path(name), ns=(i, i))
+    app.read_snapshot('a')  # a is now more recent than b
+    app.write_snapshot(df, 'c')
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(app.snapshot_path(name)) for name in 'ac')
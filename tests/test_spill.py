@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+
+import app
+from synthetic import assert_daily_equal, assert_sketch_daily_equal, make_export, reference_daily_metrics, spill
+
+
+def test_folded_partial_cubes_match_reference(rows):
+    # Partial cubes cover whole conversations, like the batches they are built from
+    shard = rows['Conversation'].cat.codes.to_numpy() % 3
+    cube = None
+    for i in range(3):
+        partial = app.RollupCube.from_frame(rows[shard == i], exact=True)
+        cube = partial if cube is None else cube.combine(partial)
+    assert_daily_equal(app.get_daily_metrics(cube), reference_daily_metrics(rows))
+
+
+def test_spilled_rows_match_in_memory(spill_dir, monkeypatch):
+    monkeypatch.setattr(app, 'budget_batch_size', lambda: 1000)
+    export = make_export(3000, 30, seed=3)
+    df = app.process_conversations(export)
+    spilled = spill(export)
+    assert len(spilled) == len(df)
+    assert spilled.rows.partition_count() == (30, 30)
+    assert_sketch_daily_equal(spilled.cube, df)
+    # Day files are regrouped into budget-sized frames for processing and exports
+    sizes = [len(frame) for frame in spilled.iter_frames()]
+    assert sum(sizes) == len(df) and max(sizes) == 1000
+
+
+def test_spills_are_pruned_least_recently_used_first(spill_dir, monkeypatch):
+    monkeypatch.setattr(app, 'SPILL_MAX_ENTRIES', 2)
+    exports = [make_export(50, 5, seed=seed) for seed in range(3)]
+    paths = []
+    for i, name in enumerate(['a', 'b']):
+        paths.append(spill(exports[i], name).path)
+        os.utime(paths[-1], ns=(i, i))
+    spill(exports[0], 'a')  # a is now more recent than b
+    paths.append(spill(exports[2], 'c').path)
+    assert sorted(os.listdir(spill_dir)) == sorted(os.path.basename(path) for path in (paths[0], paths[2]))
+
+
+def test_date_range_prunes_partitions(spill_dir):
+    export = make_export(3000, 30, seed=4)
+    df = app.process_conversations(export)
+    spilled = spill(export)
+    first = int(app.get_day_keys(df).min())
+    days = (first + 3, first + 9)
+    selected = spilled.select(days)
+    in_range = app.day_mask(app.get_day_keys(df), days)
+    assert selected.rows.partition_count() == (7, 30)
+    assert len(selected) == int(in_range.sum())
+    assert_sketch_daily_equal(selected.cube, df, days)
+    chosen = df[in_range].sort_values('S.No')
+    spilled_rows = pd.concat(list(selected.iter_frames(['S.No']))).sort_values('S.No')
+    assert spilled_rows['S.No'].tolist() == chosen['S.No'].tolist()
+
+
+def test_spill_spanning_more_than_1024_days(spill_dir):
+    # A single batch writes one file per day, past Arrow's default partition cap
+    export = make_export(1500, 1500, seed=5)
+    df = app.process_conversations(export)
+    spilled = spill(export)
+    assert spilled.rows.partition_count() == (1500, 1500)
+    assert len(spilled) == len(df)
+    assert_sketch_daily_equal(spilled.cube, df)
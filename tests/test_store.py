@@ -0,0 +1,71 @@
+import io
+import json
+
+import app
+from synthetic import assert_daily_equal, make_export
+
+
+def ingest(store, export, file_hash):
+    return store.ingest(io.BytesIO(json.dumps(export).encode()), file_hash)
+
+
+def test_rebuilding_cells_restores_the_cube():
+    kept = make_export(800, 10, seed=1)
+    removed = make_export(400, 10, seed=2, first_id=800)
+    rows = app.process_conversations({"conversations": kept["conversations"] + removed["conversations"]})
+    gone = rows['Conversation'].astype(str).isin([c["id"] for c in removed["conversations"]]).to_numpy()
+    touched = app.RollupCube.cell_keys(rows[gone])
+    remaining = rows[~gone]
+    rebuilt = app.RollupCube.from_frame(remaining[app.key_mask(app.RollupCube.cell_keys(remaining), touched)], exact=True)
+    restored = app.RollupCube.from_frame(rows, exact=True).without(touched).combine(rebuilt)
+    expected = app.RollupCube.from_frame(app.process_conversations(kept), exact=True)
+    for approximate in (False, True):
+        assert_daily_equal(app.get_daily_metrics(restored, approximate),
+                           app.get_daily_metrics(expected, approximate))
+
+
+def test_reingesting_the_same_export_changes_nothing(tmp_path):
+    export = make_export(300, 10, seed=6)
+    store = app.ConversationStore(str(tmp_path))
+    assert ingest(store, export, 'a') == (300, 0)
+    before = app.get_daily_metrics(store.cube, True)
+    # A renamed copy hashes differently but carries no new or changed conversations
+    assert ingest(store, export, 'b') == (0, 0)
+    assert store.meta['ingested'] == ['a', 'b']
+    assert_daily_equal(app.get_daily_metrics(store.cube, True), before)
+    reopened = app.ConversationStore(str(tmp_path))
+    assert reopened.meta['ingested'] == ['a', 'b'] and len(reopened.rows) == len(store.rows)
+
+
+def test_ingesting_only_changed_conversations(tmp_path):
+    export = make_export(300, 10, seed=7)
+    store = app.ConversationStore(str(tmp_path))
+    ingest(store, export, 'a')
+    export["conversations"][0]["messages"].append({"role": "user", "content": "hello"})
+    assert ingest(store, export, 'b') == (0, 1)
+    assert_daily_equal(app.get_daily_metrics(store.cube, True),
+                       app.get_daily_metrics(app.RollupCube.from_frame(app.process_conversations(export)), True))
+
+
+def test_batches_without_replies_or_countries():
+    export = make_export(20, 5, seed=8)
+    first = export["conversations"][0]
+    first["country"] = None
+    first["messages"] = [message for message in first["messages"] if message["role"] == "user"]
+    rows = app.process_conversations(export, batch_size=1)
+    batch = next(app.iter_row_batches(export["conversations"][:1]))
+    for column in app.CATEGORICAL_COLUMNS:
+        assert rows[column].cat.categories.dtype == batch[column].cat.categories.dtype
+    assert rows['Assistant Response'].isna().sum() == len(batch)
+    assert len(rows) == len(app.process_conversations(export))
+
+
+def test_ingesting_a_conversation_without_replies(tmp_path):
+    export = make_export(50, 5, seed=9)
+    store = app.ConversationStore(str(tmp_path))
+    ingest(store, export, 'a')
+    silent = {"id": "silent", "created_at": "2024-01-02T10:00:00Z", "country": None,
+              "messages": [{"role": "user", "content": "hello"}]}
+    export["conversations"].append(silent)
+    assert ingest(store, export, 'b') == (1, 0)
+    assert store.rows['Conversation'].astype(str).eq('silent').sum() == 1
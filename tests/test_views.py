@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+import app
+
+
+def sorted_view(rows, days=None):
+    # The data view as a materialized frame: newest first, renumbered
+    view = rows.sort_values('Asked at', ascending=False)
+    if days is not None:
+        view = view[app.day_mask(app.get_day_keys(view), days)]
+    view['S.No'] = np.arange(1, len(view) + 1, dtype=np.int32)
+    return view
+
+
+def test_view_positions_match_the_sorted_frame(rows, monkeypatch):
+    monkeypatch.setattr(app, 'EXPORT_CHUNK_ROWS', 700)
+    first = int(app.get_day_keys(rows).min())
+    order = app.get_view_order('views', rows)
+    for days in (None, (first + 3, first + 9)):
+        view = app.DataView(rows, app.get_date_range_order('views', days, rows, order))
+        expected = sorted_view(rows, days)
+        pd.testing.assert_frame_equal(view.take(), expected)
+        pd.testing.assert_frame_equal(view.take([5, 2]), expected.iloc[[5, 2]])
+        assert view.column('Country').tolist() == expected['Country'].tolist()
+        chunks = pd.concat(list(app.iter_chunks(view)))
+        pd.testing.assert_frame_equal(chunks, expected)
+
+
+
+def test_pages_follow_the_sort_and_filters(rows, monkeypatch):
+    cache = app.ParseCache(16, 1 << 30)
+    monkeypatch.setattr(app, 'get_row_order_cache', lambda: cache)
+    view = app.DataView(rows, app.get_view_order('pages', rows))
+    expected = sorted_view(rows)
+    expected = expected[expected['Country'].isin(['US', 'DE']) & expected['User Question'].str.contains('atlan', case=False)]
+    expected = expected.sort_values('Score', ascending=True, kind='stable', na_position='last')
+    order = app.get_row_order('pages', 'Score', True, ('US', 'DE'), 'atlan', view)
+    assert view.take(order)['S.No'].tolist() == expected['S.No'].tolist()
+    page = view.take(order[100:200])
+    pd.testing.assert_frame_equal(page, expected.iloc[100:200])
+    assert app.get_row_order('pages', 'Score', True, ('US', 'DE'), 'atlan', view) is order
+
+
+def test_row_orders_are_bounded_by_bytes(rows, monkeypatch):
+    cache = app.ParseCache(16, 3 * 4 * len(rows))
+    monkeypatch.setattr(app, 'get_row_order_cache', lambda: cache)
+    view = app.DataView(rows, app.get_view_order('bounded', rows))
+    for column in app.SORTABLE_COLUMNS:
+        app.get_row_order('bounded', column, True, (), '', view)
+    assert len(cache.entries) == 3 and cache.total_bytes <= cache.max_bytes